@@ -0,0 +1,57 @@
+"""add archived_snapshots and snapshot_rollups
+
+Revision ID: a4d8e2c6f370
+Revises: f1c6a8e24b93
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a4d8e2c6f370"
+down_revision = "f1c6a8e24b93"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "archived_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("upload_date", sa.DateTime(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("archive_path", sa.String(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_archived_snapshots_content_hash", "archived_snapshots", ["content_hash"])
+
+    op.create_table(
+        "snapshot_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("snapshot_id", sa.Integer(), nullable=False),
+        sa.Column("upload_date", sa.DateTime(), nullable=False),
+        sa.Column("district", sa.String(), nullable=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("zone", sa.String(), nullable=True),
+        sa.Column("typology", sa.String(), nullable=True),
+        sa.Column("listings", sa.Integer(), nullable=False),
+        sa.Column("avg_price", sa.Float(), nullable=True),
+        sa.Column("avg_price_per_m2", sa.Float(), nullable=True),
+        sa.Column("min_price_per_m2", sa.Float(), nullable=True),
+        sa.Column("median_price_per_m2", sa.Float(), nullable=True),
+        sa.Column("max_price_per_m2", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["snapshot_id"], ["archived_snapshots.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_snapshot_rollups_snapshot_id", "snapshot_rollups", ["snapshot_id"])
+    op.create_index("ix_snapshot_rollups_upload_date", "snapshot_rollups", ["upload_date"])
+
+
+def downgrade():
+    op.drop_index("ix_snapshot_rollups_upload_date", table_name="snapshot_rollups")
+    op.drop_index("ix_snapshot_rollups_snapshot_id", table_name="snapshot_rollups")
+    op.drop_table("snapshot_rollups")
+    op.drop_index("ix_archived_snapshots_content_hash", table_name="archived_snapshots")
+    op.drop_table("archived_snapshots")
@@ -0,0 +1,25 @@
+"""add (property_id, snapshot_id) index to property_snapshots
+
+Revision ID: b7d41e2a9c03
+Revises: 945cdf2212a9
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d41e2a9c03"
+down_revision = "945cdf2212a9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_property_snapshots_property_id_snapshot_id",
+        "property_snapshots",
+        ["property_id", "snapshot_id"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_property_snapshots_property_id_snapshot_id", table_name="property_snapshots")
@@ -0,0 +1,65 @@
+"""replace single-column categorical indexes with workload composites
+
+Revision ID: b8e3f5a1c742
+Revises: a4d8e2c6f370
+Create Date: 2026-10-19 00:00:00.000000
+
+The set is what app.index_advisor proposes for the dashboard's filter shapes:
+equality columns first, the range column last, and the analytics inputs
+(snapshot_id, property_id, price_per_m2) as INCLUDE columns. Dropped:
+
+- district / city / zone / typology: prefixes of the composites, or too few
+  distinct values to beat a sequential scan on their own,
+- address / tags: only filtered with ILIKE '%...%', which a btree can't serve,
+- id: duplicate of the primary key.
+
+Indexes are built and dropped CONCURRENTLY (outside a transaction), so the
+table stays writable. A failed concurrent build leaves an INVALID index
+behind; drop it and run the upgrade again.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b8e3f5a1c742"
+down_revision = "a4d8e2c6f370"
+branch_labels = None
+depends_on = None
+
+COVERING = ["snapshot_id", "property_id", "price_per_m2"]
+
+CREATE = [
+    ("ix_property_snapshots_district_city_zone", "property_snapshots", ["district", "city", "zone"], COVERING),
+    ("ix_property_snapshots_city_typology", "property_snapshots", ["city", "typology"], COVERING),
+    ("ix_property_snapshots_zone_typology", "property_snapshots", ["zone", "typology"], COVERING),
+    ("ix_property_snapshots_price", "property_snapshots", ["price"], []),
+    ("ix_property_snapshots_price_per_m2", "property_snapshots", ["price_per_m2"], []),
+    ("ix_properties_area", "properties", ["area"], []),
+]
+
+DROP = ["district", "city", "zone", "typology", "address", "tags", "id"]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in CREATE:
+            op.create_index(
+                name, table, columns,
+                postgresql_include=include, postgresql_concurrently=True, if_not_exists=True,
+            )
+        for column in DROP:
+            op.drop_index(
+                f"ix_property_snapshots_{column}", table_name="property_snapshots",
+                postgresql_concurrently=True, if_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for column in DROP:
+            op.create_index(
+                f"ix_property_snapshots_{column}", "property_snapshots", [column],
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+        for name, table, _, _ in reversed(CREATE):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""add deal_score / deal_percentile to property_snapshots
+
+Revision ID: c3e8f1a05d27
+Revises: b7d41e2a9c03
+Create Date: 2026-10-19 00:00:00.000000
+
+Existing snapshots are scored with `python -m app.deal_score`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c3e8f1a05d27"
+down_revision = "b7d41e2a9c03"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("property_snapshots", sa.Column("deal_score", sa.Float(), nullable=True))
+    op.add_column("property_snapshots", sa.Column("deal_percentile", sa.Float(), nullable=True))
+    op.create_index(
+        "ix_property_snapshots_snapshot_id_deal_score",
+        "property_snapshots",
+        ["snapshot_id", "deal_score"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_property_snapshots_snapshot_id_deal_score", table_name="property_snapshots")
+    op.drop_column("property_snapshots", "deal_percentile")
+    op.drop_column("property_snapshots", "deal_score")
@@ -0,0 +1,31 @@
+"""one annotation per property (unique annotations.property_id)
+
+Revision ID: d9a2c4b71e58
+Revises: c3e8f1a05d27
+Create Date: 2026-10-19 00:00:00.000000
+
+The API always kept a single row per property; older duplicates (if any) are
+collapsed to the most recent row before the constraint is added.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d9a2c4b71e58"
+down_revision = "c3e8f1a05d27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        DELETE FROM annotations a
+        USING annotations b
+        WHERE a.property_id = b.property_id AND a.id < b.id
+        """
+    )
+    op.create_unique_constraint("uq_annotations_property_id", "annotations", ["property_id"])
+
+
+def downgrade():
+    op.drop_constraint("uq_annotations_property_id", "annotations", type_="unique")
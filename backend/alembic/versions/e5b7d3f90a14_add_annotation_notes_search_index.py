@@ -0,0 +1,28 @@
+"""add full-text index on annotations.notes
+
+Revision ID: e5b7d3f90a14
+Revises: d9a2c4b71e58
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e5b7d3f90a14"
+down_revision = "d9a2c4b71e58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # expression must stay identical to app.filters.NOTES_TSVECTOR
+    op.create_index(
+        "ix_annotations_notes_fts",
+        "annotations",
+        [sa.text("to_tsvector('simple', coalesce(notes, ''))")],
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_annotations_notes_fts", table_name="annotations")
@@ -0,0 +1,24 @@
+"""add content_hash to snapshots
+
+Revision ID: f1c6a8e24b93
+Revises: e5b7d3f90a14
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f1c6a8e24b93"
+down_revision = "e5b7d3f90a14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("snapshots", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.create_unique_constraint("uq_snapshots_content_hash", "snapshots", ["content_hash"])
+
+
+def downgrade():
+    op.drop_constraint("uq_snapshots_content_hash", "snapshots", type_="unique")
+    op.drop_column("snapshots", "content_hash")
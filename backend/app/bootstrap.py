@@ -0,0 +1,113 @@
+# backend/app/bootstrap.py
+"""
+One-time database bootstrap (schema + demo seed), safe to call from every
+worker: on Postgres the work runs under a session advisory lock, so the first
+worker does it and the others only wait for the lock and see there is nothing
+left to do.
+
+DB_BOOTSTRAP controls what happens at startup:
+- "create"  (default) create missing tables and seed demo data if empty
+- "alembic" schema is managed by `alembic upgrade head`; only seed
+- "none"    do nothing (fastest; for deployments that migrate/seed out of band)
+SEED_DATA=0 disables the demo seed in every mode.
+"""
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+from . import models
+from .database import Base, engine
+
+BOOTSTRAP_MODE = os.getenv("DB_BOOTSTRAP", "create")
+SEED_DATA = os.getenv("SEED_DATA", "1") == "1"
+
+# arbitrary but fixed key shared by all workers
+ADVISORY_LOCK_KEY = 727_411_001
+
+# phase -> seconds, filled by bootstrap() and reported at startup
+timings = {}
+
+
+@contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 4)
+
+
+@contextmanager
+def _advisory_lock(conn):
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": ADVISORY_LOCK_KEY})
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_KEY})
+
+
+def seed_data(conn):
+    if conn.execute(text("SELECT 1 FROM snapshots LIMIT 1")).first():
+        return
+
+    snapshot_id = conn.execute(
+        models.Snapshot.__table__.insert()
+        .values(upload_date=datetime.utcnow())
+        .returning(models.Snapshot.id)
+    ).scalar_one()
+
+    for i in range(1, 6):
+        p = {
+            "property_id": f"FAKE{i}",
+            "title": f"Shop {i} in Porto",
+            "url": "https://www.idealista.pt/en/",
+            "area": 100 + i*10,
+            "typology": "Loja",
+            "price": 100000 + i*5000,
+            "price_per_m2": 1000 + i*50,
+            "image_url": "https://via.placeholder.com/150"
+        }
+        prop_id = conn.execute(
+            models.Property.__table__.insert()
+            .values(
+                property_id=p["property_id"],
+                title=p["title"],
+                url=p["url"],
+                area=p["area"],
+                typology=p["typology"],
+            )
+            .returning(models.Property.id)
+        ).scalar_one()
+        conn.execute(
+            models.PropertySnapshot.__table__.insert().values(
+                snapshot_id=snapshot_id,
+                property_id=prop_id,
+                price=p["price"],
+                price_per_m2=p["price_per_m2"],
+                raw_json=str(p),
+            )
+        )
+
+
+def bootstrap(mode: str = BOOTSTRAP_MODE):
+    if mode == "none":
+        return
+    with _timed("bootstrap"), engine.connect() as conn:
+        waiting = time.perf_counter()
+        with _advisory_lock(conn):
+            timings["bootstrap.lock_wait"] = round(time.perf_counter() - waiting, 4)
+            if mode == "create":
+                with _timed("bootstrap.schema"):
+                    Base.metadata.create_all(bind=conn)
+                    conn.commit()
+            if SEED_DATA:
+                with _timed("bootstrap.seed"):
+                    seed_data(conn)
+                    conn.commit()
+        conn.commit()
@@ -0,0 +1,272 @@
+# backend/app/columnar.py
+"""
+Optional in-process columnar copy of property_snapshots (COLUMNAR_STORE=1).
+
+Each snapshot is held as one segment of NumPy arrays; categorical columns are
+dictionary-encoded (int32 codes, -1 = NULL), flags are int8 (-1 = NULL) and
+numbers are float64 (NaN = NULL), so the filters in app.filters.FILTERS can be
+evaluated as vectorized masks with the same NULL semantics as SQL.
+
+The store follows the snapshots table incrementally: sync() compares the
+snapshot ids it holds with the database (at most every COLUMNAR_REFRESH_S
+seconds, or immediately after an upload/delete in this worker) and only loads
+or drops the segments that changed, so every worker converges on its own.
+"""
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+from . import models
+from .filters import FILTERS, filter_shape
+
+COLUMNAR_STORE = os.getenv("COLUMNAR_STORE", "0") == "1"
+REFRESH_SECONDS = float(os.getenv("COLUMNAR_REFRESH_S", "2"))
+
+PS = models.PropertySnapshot
+
+CATEGORICAL = ("district", "city", "zone", "typology", "agency", "address", "tags")
+FLAGS = ("parking", "elevator", "new_construction", "rented", "trespasse")
+NUMERIC = ("price", "price_per_m2", "deal_score")
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class Dictionary:
+    """value <-> int32 code; codes are never reused so segments stay valid."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self._search_cache = {}
+
+    def encode(self, values) -> "np.ndarray":
+        import numpy as np
+
+        out = np.empty(len(values), dtype=np.int32)
+        codes = self.codes
+        for i, v in enumerate(values):
+            if v is None:
+                out[i] = -1
+                continue
+            code = codes.get(v)
+            if code is None:
+                code = codes[v] = len(self.values)
+                self.values.append(v)
+            out[i] = code
+        return out
+
+    def code(self, value):
+        return self.codes.get(value)
+
+    def ilike_codes(self, pattern: str) -> "np.ndarray":
+        """Codes of values matching ILIKE '%pattern%' (with % / _ wildcards)."""
+        import numpy as np
+
+        cached = self._search_cache.get(pattern)
+        if cached is not None and cached[0] == len(self.values):
+            return cached[1]
+        regex = re.compile(
+            "".join(".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in pattern),
+            re.IGNORECASE | re.DOTALL,
+        )
+        codes = np.array(
+            [i for i, v in enumerate(self.values) if regex.search(str(v))], dtype=np.int32
+        )
+        if len(self._search_cache) > 1024:
+            self._search_cache.clear()
+        self._search_cache[pattern] = (len(self.values), codes)
+        return codes
+
+
+class Segment:
+    __slots__ = ("snapshot_id", "month", "property_id", "cols")
+
+    def __init__(self, snapshot_id, month, property_id, cols):
+        self.snapshot_id = snapshot_id
+        self.month = month
+        self.property_id = property_id
+        self.cols = cols
+
+    def __len__(self):
+        return len(self.property_id)
+
+
+class ColumnarStore:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.dicts = {c: Dictionary() for c in CATEGORICAL}
+        self.segments = {}              # snapshot_id -> Segment
+        self.area = None                # indexed by properties.id (Property.area is not per snapshot)
+        self.checked_at = 0.0
+        self.generation = 0             # bumped whenever the segment set changes
+
+    # ---- maintenance ----
+    def sync(self, db, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.checked_at < REFRESH_SECONDS:
+            return
+        snaps = dict(db.query(models.Snapshot.id, models.Snapshot.upload_date).all())
+        with self._lock:
+            changed = False
+            for sid in set(self.segments) - set(snaps):
+                del self.segments[sid]
+                changed = True
+            for sid in sorted(set(snaps) - set(self.segments)):
+                self._load_segment(db, sid, snaps[sid])
+                changed = True
+            if changed:
+                self.generation += 1
+            self.checked_at = now
+
+    def _load_segment(self, db, snapshot_id, upload_date):
+        import numpy as np
+
+        rows = (
+            db.query(
+                PS.property_id,
+                models.Property.area,
+                *[getattr(PS, c) for c in NUMERIC + CATEGORICAL + FLAGS],
+            )
+            .join(PS.property)
+            .filter(PS.snapshot_id == snapshot_id)
+            .all()
+        )
+        columns = list(zip(*rows)) if rows else [()] * (2 + len(NUMERIC + CATEGORICAL + FLAGS))
+        pids = np.array(columns[0], dtype=np.int64)
+        self._set_area(pids, columns[1])
+
+        cols = {}
+        offset = 2
+        for c in NUMERIC:
+            cols[c] = np.array([np.nan if v is None else v for v in columns[offset]], dtype=np.float64)
+            offset += 1
+        for c in CATEGORICAL:
+            cols[c] = self.dicts[c].encode(columns[offset])
+            offset += 1
+        for c in FLAGS:
+            cols[c] = np.array([-1 if v is None else int(v) for v in columns[offset]], dtype=np.int8)
+            offset += 1
+
+        month = upload_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0) if upload_date else None
+        self.segments[snapshot_id] = Segment(snapshot_id, month, pids, cols)
+
+    def _set_area(self, pids, areas):
+        import numpy as np
+
+        if self.area is None:
+            self.area = np.empty(0)
+        if not len(pids):
+            return
+        top = int(pids.max()) + 1
+        if top > len(self.area):
+            grown = np.full(max(top, len(self.area) * 2), np.nan)
+            grown[:len(self.area)] = self.area
+            self.area = grown
+        self.area[pids] = [np.nan if a is None else a for a in areas]
+
+    # ---- evaluation ----
+    def _column(self, seg, name):
+        if name == "area":
+            return self.area[seg.property_id]
+        return seg.cols[name]
+
+    def mask(self, seg, filters: dict, shape: tuple) -> "np.ndarray":
+        import numpy as np
+
+        m = np.ones(len(seg), dtype=bool)
+        for key in shape:
+            column, op = FILTERS[key]
+            name = column.key
+            value = filters[key]
+            arr = self._column(seg, name)
+            if op == "eq":
+                code = self.dicts[name].code(value)
+                if code is None:
+                    return np.zeros(len(seg), dtype=bool)
+                m &= arr == code
+            elif op == "flag":
+                m &= arr == int(bool(value))
+            elif op == "in":
+                codes = [self.dicts[name].code(v) for v in value]
+                m &= np.isin(arr, [c for c in codes if c is not None])
+            elif op == "contains":
+                m &= np.isin(arr, self.dicts[name].ilike_codes(str(value)))
+            elif op == "ge":
+                m &= arr >= value
+            elif op == "le":
+                m &= arr <= value
+        return m
+
+    def matching_property_ids(self, filters: dict) -> "np.ndarray":
+        """Properties with at least one snapshot row matching the filters."""
+        import numpy as np
+
+        shape = filter_shape(filters)
+        with self._lock:
+            hits = [seg.property_id[self.mask(seg, filters, shape)] for seg in self.segments.values()]
+        return np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+
+    def distinct(self, column: str, where: dict = None) -> list:
+        """Distinct non-NULL values of a categorical column, optionally filtered by equality."""
+        import numpy as np
+
+        where = {k: v for k, v in (where or {}).items() if v}
+        shape = filter_shape(where)
+        with self._lock:
+            codes = [
+                seg.cols[column][self.mask(seg, where, shape)] if shape else seg.cols[column]
+                for seg in self.segments.values()
+            ]
+            if not codes:
+                return []
+            present = np.unique(np.concatenate(codes))
+            values = self.dicts[column].values
+            return sorted(values[c] for c in present if c >= 0)
+
+    def monthly(self, name: str, filters: dict) -> list:
+        """Same rows as analytics.monthly_rows() for the three monthly analytics routes."""
+        import numpy as np
+
+        shape = filter_shape(filters)
+        by_month = {}
+        with self._lock:
+            for seg in self.segments.values():
+                m = self.mask(seg, filters, shape)
+                if m.any():
+                    by_month.setdefault(seg.month, []).append(seg.cols["price_per_m2"][m])
+
+        out = []
+        for month in sorted(by_month):
+            values = np.concatenate(by_month[month])
+            present = values[~np.isnan(values)]
+            if name == "listings_per_month":
+                out.append(SimpleNamespace(month=month, listings=len(values)))
+            elif name == "avg_price_per_m2":
+                out.append(SimpleNamespace(
+                    month=month, avg_price=present.mean() if len(present) else None, n=len(present),
+                ))
+            elif name == "price_distribution":
+                empty = not len(present)
+                out.append(SimpleNamespace(
+                    month=month,
+                    min_price=None if empty else present.min(),
+                    max_price=None if empty else present.max(),
+                    median_price=None if empty else np.median(present),
+                    n=len(present),
+                ))
+        return out
+
+
+store = ColumnarStore()
+
+
+def get_store(db, force: bool = False):
+    """The synced store, or None when COLUMNAR_STORE is off (callers fall back to SQL)."""
+    if not COLUMNAR_STORE:
+        return None
+    store.sync(db, force=force)
+    return store
@@ -0,0 +1,190 @@
+# backend/app/comps.py
+"""
+Comparable listings ("comps").
+
+The index holds the latest row of every property as NumPy arrays and, for the
+listings seen within COMPS_MAX_AGE_DAYS of the newest snapshot, position
+arrays grouped by (typology, zone) and (typology, city). A query only looks at
+the subject's group, so k-nearest-neighbour is one vectorized distance pass
+plus an argpartition over a few hundred candidates.
+
+Distance = euclidean over log(area) and log(price_per_m2) (each scaled by
+COMPS_LOG_SCALE, so 0.25 ~ "25% apart" counts as 1) + age_days / COMPS_RECENCY_DAYS.
+The zone group is used when it has at least k candidates, otherwise the city
+group.
+
+The index is rebuilt lazily: invalidate() after an upload/delete in this
+worker, and every COMPS_REFRESH_S seconds a cheap (count, max id) check over
+snapshots picks up changes made by other workers.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from . import models
+
+MAX_AGE_DAYS = float(os.getenv("COMPS_MAX_AGE_DAYS", "90"))
+RECENCY_DAYS = float(os.getenv("COMPS_RECENCY_DAYS", "60"))
+LOG_SCALE = float(os.getenv("COMPS_LOG_SCALE", "0.25"))
+REFRESH_SECONDS = float(os.getenv("COMPS_REFRESH_S", "5"))
+
+PS = models.PropertySnapshot
+
+
+class CompsIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.signature = None
+        self.checked_at = 0.0
+        self.stale = True
+        self.pos = {}               # properties.id -> row in the arrays below
+        self.groups = {}            # ("zone"|"city", typology, value) -> positions (int64)
+
+    # ---- maintenance ----
+    def invalidate(self):
+        self.stale = True
+
+    def sync(self, db):
+        now = time.monotonic()
+        if not self.stale and now - self.checked_at < REFRESH_SECONDS:
+            return
+        signature = tuple(db.query(func.count(models.Snapshot.id), func.max(models.Snapshot.id)).one())
+        with self._lock:
+            if self.stale or signature != self.signature:
+                self._build(db)
+                self.signature = signature
+                self.stale = False
+            self.checked_at = now
+
+    def _build(self, db):
+        import numpy as np
+
+        latest_ids = select(func.max(PS.id)).group_by(PS.property_id)
+        rows = (
+            db.query(
+                PS.property_id,
+                models.Property.title,
+                models.Property.area,
+                PS.price,
+                PS.price_per_m2,
+                PS.typology,
+                PS.zone,
+                PS.city,
+                models.Snapshot.upload_date,
+            )
+            .join(PS.property)
+            .join(PS.snapshot)
+            .filter(PS.id.in_(latest_ids))
+            .all()
+        )
+        self.ids = np.array([r.property_id for r in rows], dtype=np.int64)
+        self.titles = [r.title for r in rows]
+        self.typology = [r.typology for r in rows]
+        self.zone = [r.zone for r in rows]
+        self.city = [r.city for r in rows]
+        self.last_seen = [r.upload_date for r in rows]
+        self.area = np.array([np.nan if r.area is None else r.area for r in rows], dtype=np.float64)
+        self.price = np.array([np.nan if r.price is None else r.price for r in rows], dtype=np.float64)
+        self.ppm2 = np.array(
+            [np.nan if r.price_per_m2 is None else r.price_per_m2 for r in rows], dtype=np.float64
+        )
+        self.pos = {pid: i for i, pid in enumerate(self.ids.tolist())}
+
+        # features only exist for positive area / price_per_m2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.log_area = np.where(self.area > 0, np.log(self.area), np.nan)
+            self.log_ppm2 = np.where(self.ppm2 > 0, np.log(self.ppm2), np.nan)
+
+        dates = [d for d in self.last_seen if d is not None]
+        newest = max(dates) if dates else None
+        self.age_days = np.array(
+            [np.inf if d is None else (newest - d).total_seconds() / 86400 for d in self.last_seen],
+            dtype=np.float64,
+        )
+
+        usable = ~np.isnan(self.log_area) & ~np.isnan(self.log_ppm2) & (self.age_days <= MAX_AGE_DAYS)
+        grouped = {}
+        for i in np.flatnonzero(usable).tolist():
+            typ = self.typology[i]
+            if self.zone[i] is not None:
+                grouped.setdefault(("zone", typ, self.zone[i]), []).append(i)
+            if self.city[i] is not None:
+                grouped.setdefault(("city", typ, self.city[i]), []).append(i)
+        self.groups = {key: np.array(v, dtype=np.int64) for key, v in grouped.items()}
+
+    # ---- queries ----
+    def _group(self, i, k):
+        zone = ("zone", self.typology[i], self.zone[i])
+        # the subject itself is in its own group, hence k + 1
+        if len(self.groups.get(zone, ())) >= k + 1:
+            return zone
+        city = ("city", self.typology[i], self.city[i])
+        return city if city in self.groups else zone
+
+    def _batch(self, subjects, cand, k):
+        """Distance matrix subjects x candidates, then top-k per row."""
+        import numpy as np
+
+        s = np.array(subjects, dtype=np.int64)
+        d_area = (self.log_area[cand][None, :] - self.log_area[s][:, None]) / LOG_SCALE
+        d_ppm2 = (self.log_ppm2[cand][None, :] - self.log_ppm2[s][:, None]) / LOG_SCALE
+        dist = np.sqrt(d_area * d_area + d_ppm2 * d_ppm2) + self.age_days[cand][None, :] / RECENCY_DAYS
+        dist[cand[None, :] == s[:, None]] = np.inf     # never your own comp
+        dist[np.isnan(dist)] = np.inf                  # subject without features
+
+        kk = min(k, len(cand))
+        top = np.argpartition(dist, kk - 1, axis=1)[:, :kk] if kk else np.empty((len(s), 0), dtype=np.int64)
+        for row, i in enumerate(subjects):
+            order = top[row][np.argsort(dist[row, top[row]], kind="stable")]
+            yield i, [
+                self._row(int(cand[t]), float(dist[row, t])) for t in order if np.isfinite(dist[row, t])
+            ]
+
+    def _row(self, j, distance):
+        import numpy as np
+
+        def num(arr):
+            return None if np.isnan(arr[j]) else float(arr[j])
+
+        return {
+            "id": int(self.ids[j]),
+            "title": self.titles[j],
+            "area": num(self.area),
+            "price": num(self.price),
+            "price_per_m2": num(self.ppm2),
+            "typology": self.typology[j],
+            "zone": self.zone[j],
+            "city": self.city[j],
+            "last_seen": self.last_seen[j],
+            "distance": round(distance, 4),
+        }
+
+    def query(self, property_ids, k: int):
+        """
+        Comps for many subjects at once; subjects sharing a group are answered
+        with one distance matrix. Ids without any listing map to None.
+        """
+        import numpy as np
+
+        with self._lock:
+            out = dict.fromkeys(property_ids)
+            by_group = {}
+            for pid in property_ids:
+                i = self.pos.get(pid)
+                if i is not None:
+                    by_group.setdefault(self._group(i, k), []).append(i)
+            for key, subjects in by_group.items():
+                cand = self.groups.get(key, np.empty(0, dtype=np.int64))
+                for i, comps in self._batch(subjects, cand, k):
+                    out[int(self.ids[i])] = {"property_id": int(self.ids[i]), "scope": key[0], "comps": comps}
+            return out
+
+
+index = CompsIndex()
+
+
+def get_index(db):
+    index.sync(db)
+    return index
@@ -1,16 +1,52 @@
 # backend/app/database.py
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
-    "postgresql+psycopg2://user:password@db:5432/properties"
+    "postgresql+psycopg://user:password@db:5432/properties"
 )
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# SQLAlchemy compiled-statement cache (per engine); hot paths reuse a statement
+# per filter shape, so this only needs to hold a few hundred entries
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+# psycopg 3 prepares a statement server-side after it ran this many times on a
+# connection (None disables). psycopg2 has no server-side prepare.
+PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "2")
+
+# Optional read replica for read-only routes (see get_read_db)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+# replicas lagging more than this are skipped
+REPLICA_MAX_LAG_S = float(os.getenv("REPLICA_MAX_LAG_S", "5"))
+# after this worker commits, reads stay on the primary at least this long
+REPLICA_STICKY_S = float(os.getenv("REPLICA_STICKY_S", "2"))
+REPLICA_LAG_CHECK_S = float(os.getenv("REPLICA_LAG_CHECK_S", "1"))
+
+
+def engine_kwargs(url: str) -> dict:
+    kwargs = {"pool_pre_ping": True, "query_cache_size": QUERY_CACHE_SIZE}
+    if make_url(url).drivername == "postgresql+psycopg":
+        threshold = None if PREPARE_THRESHOLD.lower() == "none" else int(PREPARE_THRESHOLD)
+        kwargs["connect_args"] = {"prepare_threshold": threshold}
+    return kwargs
+
+
+engine = create_engine(DATABASE_URL, **engine_kwargs(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engine = (
+    create_engine(REPLICA_DATABASE_URL, **engine_kwargs(REPLICA_DATABASE_URL))
+    if REPLICA_DATABASE_URL else None
+)
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None else None
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -19,3 +55,73 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def engines():
+    return [e for e in (engine, replica_engine) if e is not None]
+
+
+# ---- Replica routing ----
+class ReplicaState:
+    """
+    When this worker last wrote to the primary, and how far the replica lags
+    (seconds, None = unreachable), re-measured at most every REPLICA_LAG_CHECK_S.
+    """
+
+    # 0 when the replica has replayed everything it received, or when the
+    # server is not a standby at all (two independent local instances)
+    LAG_SQL = text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last_write = float("-inf")
+        self.lag = None
+        self.checked_at = float("-inf")
+
+    def mark_write(self):
+        self.last_write = time.monotonic()
+
+    def current_lag(self):
+        now = time.monotonic()
+        if now - self.checked_at < REPLICA_LAG_CHECK_S:
+            return self.lag
+        with self._lock:
+            if now - self.checked_at >= REPLICA_LAG_CHECK_S:
+                try:
+                    with replica_engine.connect() as conn:
+                        self.lag = float(conn.execute(self.LAG_SQL).scalar())
+                except Exception:
+                    self.lag = None
+                self.checked_at = now
+        return self.lag
+
+    def usable(self) -> bool:
+        if replica_engine is None:
+            return False
+        lag = self.current_lag()
+        if lag is None or lag > REPLICA_MAX_LAG_S:
+            return False
+        # read-after-write: our own recent commits may not have replayed yet
+        return time.monotonic() - self.last_write > max(lag, REPLICA_STICKY_S)
+
+
+replica = ReplicaState()
+
+
+@event.listens_for(engine, "commit")
+def _mark_write(conn):
+    # only routes that write commit; plain reads end with close() / rollback
+    replica.mark_write()
+
+
+def get_read_db():
+    """Session for read-only routes: the replica when it is fresh enough, else the primary."""
+    db = ReplicaSessionLocal() if replica.usable() else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,106 @@
+# backend/app/deal_score.py
+"""
+Deal score: how far below its market a listing's price_per_m2 is.
+
+For every row of a snapshot the market is the listing's (zone, typology)
+segment in that snapshot, or (city, typology) when the zone segment has fewer
+than DEAL_SCORE_MIN_SEGMENT listings. With robust statistics
+
+    deal_score = (segment median - price_per_m2) / (1.4826 * MAD)
+
+so 0 is "at market", 2 is "two robust standard deviations cheaper".
+deal_percentile is the score's percentile rank (0-100) within the segment.
+Rows without price_per_m2 or a large enough segment get NULL.
+
+Computed once per snapshot at ingest; to backfill existing snapshots:
+
+    python -m app.deal_score
+"""
+import os
+
+from sqlalchemy import bindparam, update
+
+from . import models
+
+MIN_SEGMENT = int(os.getenv("DEAL_SCORE_MIN_SEGMENT", "5"))
+# MAD of a segment with many identical prices is 0; floor the scale at 1% of the median
+MIN_SCALE = 0.01
+
+PS = models.PropertySnapshot
+
+
+def _segment_stats(df, keys):
+    grouped = df.groupby(keys, dropna=False)["ppm2"]
+    size = grouped.transform("size")
+    median = grouped.transform("median")
+    mad = (df["ppm2"] - median).abs().groupby([df[k] for k in keys], dropna=False).transform("median")
+    return size, median, mad
+
+
+def compute_scores(rows):
+    """rows: (id, price_per_m2, zone, city, typology) -> DataFrame(id, deal_score, deal_percentile)."""
+    # numpy and pandas are only needed at ingest time
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=["id", "ppm2", "zone", "city", "typology"])
+    df = df[df["ppm2"].notna() & (df["ppm2"] > 0)]
+    if df.empty:
+        return df.assign(deal_score=[], deal_percentile=[])[["id", "deal_score", "deal_percentile"]]
+    df["ppm2"] = df["ppm2"].astype(float)
+
+    z_size, z_median, z_mad = _segment_stats(df, ["zone", "typology"])
+    c_size, c_median, c_mad = _segment_stats(df, ["city", "typology"])
+
+    use_zone = df["zone"].notna() & (z_size >= MIN_SEGMENT)
+    use_city = ~use_zone & df["city"].notna() & (c_size >= MIN_SEGMENT)
+    median = np.where(use_zone, z_median, np.where(use_city, c_median, np.nan))
+    mad = np.where(use_zone, z_mad, c_mad)
+    scale = np.maximum(1.4826 * mad, MIN_SCALE * median)
+
+    df["deal_score"] = (median - df["ppm2"].to_numpy()) / scale
+    df["segment"] = np.where(
+        use_zone,
+        "z:" + df["zone"].astype(str) + "|" + df["typology"].astype(str),
+        "c:" + df["city"].astype(str) + "|" + df["typology"].astype(str),
+    )
+    df["deal_percentile"] = df.groupby("segment")["deal_score"].rank(pct=True) * 100
+    df = df[df["deal_score"].notna()]
+    return df[["id", "deal_score", "deal_percentile"]]
+
+
+def score_snapshot(db, snapshot_id: int) -> int:
+    """Computes and stores deal scores for one snapshot; returns rows scored."""
+    rows = (
+        db.query(PS.id, PS.price_per_m2, PS.zone, PS.city, PS.typology)
+        .filter(PS.snapshot_id == snapshot_id)
+        .all()
+    )
+    scores = compute_scores(rows)
+    if scores.empty:
+        return 0
+    stmt = (
+        update(PS.__table__)
+        .where(PS.__table__.c.id == bindparam("row_id"))
+        .values(deal_score=bindparam("score"), deal_percentile=bindparam("percentile"))
+    )
+    db.execute(
+        stmt,
+        [
+            {"row_id": int(i), "score": round(float(s), 4), "percentile": round(float(p), 2)}
+            for i, s, p in scores.itertuples(index=False)
+        ],
+    )
+    db.commit()
+    return len(scores)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for (sid,) in db.query(models.Snapshot.id).order_by(models.Snapshot.id).all():
+            print(f"snapshot {sid}: {score_snapshot(db, sid)} rows scored")
+    finally:
+        db.close()
@@ -0,0 +1,184 @@
+# backend/app/events.py
+"""
+Server-sent events: ingest progress and data-generation changes.
+
+    GET /events   text/event-stream
+
+Events (the SSE "event:" field, JSON "data:"):
+
+- generation  {"generation": "<snapshots count>.<max snapshot id>"}
+  sent once on connect and whenever a snapshot is added or deleted; clients
+  re-fetch only when it differs from the generation their data came from,
+- ingest      {"ingest_id", "filename", "stage": parse|write|done|failed,
+               "rows", "total", "rate"}  (rows per second in the stage,
+  over the whole ingest for "done")
+
+Every worker publishes with NOTIFY on CHANNEL and a listener thread per
+worker LISTENs, so a client connected to any worker sees every ingest. On a
+database without LISTEN/NOTIFY (or another driver than psycopg 3) events only
+reach clients of the publishing worker.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, text
+
+from . import database, models
+
+CHANNEL = "property_events"
+# seconds between keep-alive comments on an idle stream (proxies drop silent ones)
+HEARTBEAT_S = 15
+# ingest progress is published at most this often per stage
+PROGRESS_INTERVAL_S = 0.5
+# events a slow client may fall behind before the oldest are dropped
+QUEUE_SIZE = 100
+
+
+# ---- In-process fan-out ----
+_subscribers = set()        # (loop, asyncio.Queue)
+_subscribers_lock = threading.Lock()
+
+
+def _put(queue, event):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+def _dispatch(event: dict):
+    """Hands an event to every stream of this worker; safe from any thread."""
+    with _subscribers_lock:
+        targets = list(_subscribers)
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(_put, queue, event)
+        except RuntimeError:
+            # loop already closed; the stream's finally will unsubscribe it
+            pass
+
+
+def subscribe():
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    entry = (asyncio.get_running_loop(), queue)
+    with _subscribers_lock:
+        _subscribers.add(entry)
+    return entry
+
+
+def unsubscribe(entry):
+    with _subscribers_lock:
+        _subscribers.discard(entry)
+
+
+def _uses_notify() -> bool:
+    return database.engine.url.drivername == "postgresql+psycopg"
+
+
+def publish(event: str, **data):
+    payload = {"event": event, **data}
+    if not _uses_notify():
+        _dispatch(payload)
+        return
+    try:
+        # autocommit: NOTIFY goes out now and no commit marks this worker as a writer
+        with database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": CHANNEL, "payload": json.dumps(payload)})
+    except Exception as e:
+        # events are advisory; never fail an ingest over them
+        print(f"[events] publish failed: {e}")
+        _dispatch(payload)
+
+
+# ---- Generation ----
+def current_generation(db) -> str:
+    count, max_id = db.query(func.count(models.Snapshot.id), func.max(models.Snapshot.id)).one()
+    return f"{count}.{max_id or 0}"
+
+
+def publish_generation(db):
+    publish("generation", generation=current_generation(db))
+
+
+# ---- Ingest progress ----
+class Progress:
+    """Throttled progress of one ingest; report() is cheap to call per batch."""
+
+    def __init__(self, ingest_id: str = None, filename: str = None):
+        self.ingest_id = ingest_id or uuid.uuid4().hex
+        self.filename = filename
+        self.stage = None
+        self.created = self.started = self.sent_at = time.monotonic()
+
+    def report(self, stage: str, rows: int, total: int = None):
+        now = time.monotonic()
+        if stage != self.stage:
+            # a stage starts where the previous one reported last
+            self.stage, self.started = stage, self.sent_at
+        elif rows != total and now - self.sent_at < PROGRESS_INTERVAL_S:
+            return
+        self.sent_at = now
+        elapsed = now - (self.created if stage == "done" else self.started)
+        publish(
+            "ingest", ingest_id=self.ingest_id, filename=self.filename, stage=stage,
+            rows=rows, total=total, rate=round(rows / elapsed, 1) if elapsed > 0 else None,
+        )
+
+    def failed(self, detail: str):
+        publish("ingest", ingest_id=self.ingest_id, filename=self.filename,
+                stage="failed", detail=detail)
+
+
+# ---- LISTEN thread ----
+class Listener(threading.Thread):
+    """One LISTEN connection per worker, forwarding notifications to _dispatch."""
+
+    def __init__(self):
+        super().__init__(name="events-listener", daemon=True)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        import psycopg
+
+        conninfo = database.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    while not self._stopping.is_set():
+                        # wake up every second to notice stop()
+                        for note in conn.notifies(timeout=1.0):
+                            _dispatch(json.loads(note.payload))
+            except Exception as e:
+                print(f"[events] listener reconnecting: {e}")
+                self._stopping.wait(2)
+
+
+_listener = None
+
+
+def start():
+    global _listener
+    if _uses_notify() and _listener is None:
+        _listener = Listener()
+        _listener.start()
+
+
+def stop():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener.join(timeout=5)
+        _listener = None
+
+
+def format_sse(event: dict) -> str:
+    event = dict(event)
+    name = event.pop("event")
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
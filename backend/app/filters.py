@@ -0,0 +1,190 @@
+# backend/app/filters.py
+"""
+Listing / analytics filters.
+
+FILTERS declares every supported filter once. A request's "shape" is the tuple
+of filters that are active; clauses for a shape are built once with named bind
+parameters (f_<key>) and cached, and the request's values are bound at
+execution time, so every request with the same shape shares one statement.
+
+Every shape that reaches SQL (filter_params) is counted in `workload`; the
+index advisor (app.index_advisor) proposes indexes from those counts.
+
+Annotation filters become EXISTS / NOT EXISTS on annotations (one row per
+property, unique on property_id), i.e. a semi- or anti-join. Their polarity
+is part of the shape ("!reviewed" = NOT EXISTS) so each shape keeps one plan.
+"""
+import threading
+from collections import Counter
+
+from sqlalchemy import Boolean, and_, bindparam, func, literal_column, select
+
+from . import models
+from .statements import StatementCache
+
+PS = models.PropertySnapshot
+A = models.Annotation
+
+# must match ix_annotations_notes_fts exactly for the GIN index to be used
+NOTES_TSVECTOR = func.to_tsvector(
+    literal_column("'simple'"), func.coalesce(A.notes, literal_column("''"))
+)
+
+# key -> (column, operator)
+#   eq: equality, active when truthy     flag: equality, active when not None
+#   in: IN (expanding), active when truthy
+#   contains: ILIKE %v%, active when truthy
+#   ge / le: range bounds, active when not None
+#   exists: annotation flag / has-notes; True = EXISTS, False = NOT EXISTS
+#   exists_eq: annotation equals value; "unset" = NOT EXISTS a value
+#   exists_match: full-text match on annotation notes, active when truthy
+FILTERS = {
+    # Categorical equals
+    "district": (PS.district, "eq"),
+    "city": (PS.city, "eq"),
+    "zone": (PS.zone, "eq"),
+    "agency": (PS.agency, "eq"),
+    # Typology can be list (e.g., ["T2","T3","T4"]); the list wins over a single value
+    "typology_list": (PS.typology, "in"),
+    "typology": (PS.typology, "eq"),
+    # Boolean flags
+    "parking": (PS.parking, "flag"),
+    "elevator": (PS.elevator, "flag"),
+    "new_construction": (PS.new_construction, "flag"),
+    "rented": (PS.rented, "flag"),
+    "trespasse": (PS.trespasse, "flag"),
+    # Text search (ILIKE)
+    "search_address": (PS.address, "contains"),
+    "search_tags": (PS.tags, "contains"),
+    # Numeric ranges
+    "min_price": (PS.price, "ge"),
+    "max_price": (PS.price, "le"),
+    "min_price_per_m2": (PS.price_per_m2, "ge"),
+    "max_price_per_m2": (PS.price_per_m2, "le"),
+    # area is on Property (not on PropertySnapshot)
+    "min_area": (models.Property.area, "ge"),
+    "max_area": (models.Property.area, "le"),
+    # precomputed at ingest (app.deal_score)
+    "min_deal_score": (PS.deal_score, "ge"),
+    # Annotations (pushed down as semi- / anti-joins)
+    "reviewed": (A.reviewed, "exists"),
+    "contacted": (A.contacted, "exists"),
+    "has_notes": (A.notes, "exists"),
+    "interesting": (A.interesting, "exists_eq"),
+    "search_notes": (A.notes, "exists_match"),
+}
+
+_NOT_NONE_OPS = ("flag", "ge", "le", "exists")
+ANNOTATION_OPS = ("exists", "exists_eq", "exists_match")
+INTERESTING_UNSET = "unset"
+
+_clauses = StatementCache("filter_clauses")
+
+
+def _negated(key: str, value) -> bool:
+    op = FILTERS[key][1]
+    return (op == "exists" and not value) or (op == "exists_eq" and value == INTERESTING_UNSET)
+
+
+def filter_shape(filters: dict) -> tuple:
+    shape = []
+    for key, (_, op) in FILTERS.items():
+        value = filters.get(key)
+        if value is not None if op in _NOT_NONE_OPS else value:
+            shape.append(f"!{key}" if _negated(key, value) else key)
+    if "typology_list" in shape and "typology" in shape:
+        shape.remove("typology")
+    return tuple(shape)
+
+
+def uses_annotations(shape: tuple) -> bool:
+    return any(FILTERS[key.lstrip("!")][1] in ANNOTATION_OPS for key in shape)
+
+
+def _annotation_clause(column, op, param, negated):
+    if op == "exists":
+        if isinstance(column.type, Boolean):
+            cond = column.is_(True)
+        else:
+            cond = and_(column.isnot(None), column != "")
+    elif op == "exists_eq":
+        cond = column.isnot(None) if negated else column == param
+    else:
+        cond = NOTES_TSVECTOR.op("@@")(func.plainto_tsquery(literal_column("'simple'"), param))
+    sub = select(A.id).where(A.property_id == PS.property_id, cond).exists()
+    return ~sub if negated else sub
+
+
+def _build_clauses(shape: tuple) -> tuple:
+    out = []
+    for entry in shape:
+        key = entry.lstrip("!")
+        column, op = FILTERS[key]
+        param = bindparam(f"f_{key}", expanding=(op == "in"))
+        if op in ANNOTATION_OPS:
+            out.append(_annotation_clause(column, op, param, entry.startswith("!")))
+        elif op in ("eq", "flag"):
+            out.append(column == param)
+        elif op == "in":
+            out.append(column.in_(param))
+        elif op == "contains":
+            out.append(column.ilike(param))
+        elif op == "ge":
+            out.append(column >= param)
+        elif op == "le":
+            out.append(column <= param)
+    return tuple(out)
+
+
+def filter_clauses(shape: tuple) -> tuple:
+    return _clauses.get(shape, lambda: _build_clauses(shape))
+
+
+class ShapeRecorder:
+    """How often each filter shape was sent to the database, in this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def record(self, shape: tuple):
+        with self._lock:
+            self.counts[shape] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+    def clear(self):
+        with self._lock:
+            self.counts.clear()
+
+
+workload = ShapeRecorder()
+
+
+def filter_params(filters: dict, shape: tuple) -> dict:
+    workload.record(shape)
+    params = {}
+    for key in shape:
+        # exists filters and negations carry no value: it is in the shape
+        if key.startswith("!") or FILTERS[key][1] == "exists":
+            continue
+        value = filters[key]
+        if FILTERS[key][1] == "contains":
+            value = f"%{value}%"
+        elif FILTERS[key][1] == "in":
+            value = list(value)
+        params[f"f_{key}"] = value
+    return params
+
+
+def apply_filters(query, filters: dict):
+    """
+    Reusable filters for both property listing and analytics queries.
+    Works with a query that already involves PropertySnapshot (and Property for area).
+    """
+    shape = filter_shape(filters)
+    if not shape:
+        return query
+    return query.filter(*filter_clauses(shape)).params(**filter_params(filters, shape))
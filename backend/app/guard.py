@@ -0,0 +1,224 @@
+# backend/app/guard.py
+"""
+Overload protection for the query-heavy routes.
+
+For every request under a prefix in QUERY_DEADLINES (longest match wins):
+
+- Load shedding: at most MAX_CONCURRENT_QUERIES such requests run at once per
+  worker. Up to QUERY_QUEUE_SIZE more wait, each for at most QUERY_QUEUE_WAIT_S;
+  anything beyond that gets 503 with Retry-After right away, so a burst costs
+  a bounded wait instead of an ever-growing queue in front of the pool.
+- Deadline: every transaction the request opens starts with
+  SET LOCAL statement_timeout, so Postgres cancels a runaway statement itself
+  and the request fails with 504 instead of holding its connection for minutes.
+- Client disconnect: when the client goes away before the response starts,
+  the running statements are cancelled (dbapi connection.cancel()) and their
+  connections go back to the pool; a transaction the request tries to begin
+  afterwards raises ClientDisconnected (499).
+
+    QUERY_DEADLINES="/properties=10000,/analytics=30000"   # ms per prefix
+
+A deadline of 0 leaves a prefix out (e.g. in-memory typeahead).
+"""
+import asyncio
+import os
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))
+QUEUE_SIZE = int(os.getenv("QUERY_QUEUE_SIZE", "32"))
+QUEUE_WAIT_S = float(os.getenv("QUERY_QUEUE_WAIT_S", "5"))
+RETRY_AFTER_S = int(os.getenv("QUERY_RETRY_AFTER_S", "2"))
+
+# Postgres SQLSTATE query_canceled (statement_timeout or a cancel request)
+QUERY_CANCELED = "57014"
+
+
+def _parse_deadlines(value: str) -> dict:
+    out = {}
+    for part in value.split(","):
+        prefix, _, ms = part.strip().partition("=")
+        if prefix and ms:
+            out[prefix.rstrip("/")] = int(ms)
+    return out
+
+
+DEADLINES = _parse_deadlines(
+    os.getenv("QUERY_DEADLINES", "/properties=10000,/properties/suggest=0,/analytics=30000")
+)
+
+
+def deadline_ms(path: str) -> Optional[int]:
+    best = None
+    for prefix, ms in DEADLINES.items():
+        if (path == prefix or path.startswith(prefix + "/")) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return DEADLINES[best] if best is not None and DEADLINES[best] > 0 else None
+
+
+class RequestGuard:
+    """Deadline of one request and the dbapi connections it is using right now."""
+
+    def __init__(self, timeout_ms: int):
+        self.timeout_ms = timeout_ms
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def add(self, dbapi_conn):
+        with self._lock:
+            self._connections.add(dbapi_conn)
+
+    def discard(self, dbapi_conn):
+        with self._lock:
+            self._connections.discard(dbapi_conn)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for dbapi_conn in self._connections:
+                try:
+                    dbapi_conn.cancel()
+                except Exception:
+                    pass
+
+
+_current: ContextVar[Optional[RequestGuard]] = ContextVar("request_guard", default=None)
+
+
+class ClientDisconnected(Exception):
+    """The client of the current request went away; nothing new is started for it."""
+
+
+# ---- Session hooks ----
+def _dbapi(connection):
+    return connection.connection.dbapi_connection
+
+
+@event.listens_for(Session, "after_begin")
+def _after_begin(session, transaction, connection):
+    guard = _current.get()
+    if guard is None or connection.dialect.name != "postgresql":
+        return
+    if guard.cancelled:
+        # the client is gone: don't start anything new for it
+        raise ClientDisconnected()
+    # LOCAL: the pooled connection is back to the server default at commit / rollback
+    connection.execute(
+        text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(guard.timeout_ms)}
+    )
+    guard.add(_dbapi(connection))
+    session.info.setdefault("guarded", []).append(_dbapi(connection))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    guard = _current.get()
+    if transaction.parent is not None or guard is None:
+        return
+    for dbapi_conn in session.info.pop("guarded", ()):
+        guard.discard(dbapi_conn)
+
+
+# ---- Errors ----
+def is_query_canceled(exc: OperationalError) -> bool:
+    orig = exc.orig
+    # psycopg 3: sqlstate, psycopg2: pgcode
+    return (getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)) == QUERY_CANCELED
+
+
+async def operational_error_handler(request, exc: OperationalError):
+    if not is_query_canceled(exc):
+        raise exc
+    guard = _current.get()
+    timeout = f" ({guard.timeout_ms} ms)" if guard is not None else ""
+    return JSONResponse(status_code=504, content={"detail": f"Query exceeded its deadline{timeout}"})
+
+
+async def client_disconnected_handler(request, exc: ClientDisconnected):
+    # nginx's "client closed request"; nobody reads it, but logs and metrics do
+    return JSONResponse(status_code=499, content={"detail": "Client closed request"})
+
+
+# ---- ASGI middleware ----
+class _Limiter:
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+        self.waiting = 0
+
+
+class GuardMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._limiter = None
+
+    async def _overloaded(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=503,
+            content={"detail": "Server busy, retry shortly"},
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        timeout_ms = deadline_ms(scope["path"]) if scope["type"] == "http" else None
+        if timeout_ms is None:
+            await self.app(scope, receive, send)
+            return
+
+        # created lazily: the semaphore belongs to the server's event loop
+        limiter = self._limiter = self._limiter or _Limiter()
+        if limiter.semaphore.locked() and limiter.waiting >= QUEUE_SIZE:
+            await self._overloaded(scope, receive, send)
+            return
+        limiter.waiting += 1
+        acquired = False
+        try:
+            async with asyncio.timeout(QUEUE_WAIT_S):
+                await limiter.semaphore.acquire()
+                acquired = True
+        except TimeoutError:
+            # the permit can be granted in the same tick the timeout fires: give it back
+            if acquired:
+                limiter.semaphore.release()
+            await self._overloaded(scope, receive, send)
+            return
+        finally:
+            limiter.waiting -= 1
+
+        guard = RequestGuard(timeout_ms)
+        token = _current.set(guard)
+        started = False
+        loop = asyncio.get_running_loop()
+        # the watcher owns receive(); the app reads what it forwards
+        inbox = asyncio.Queue()
+
+        async def watch():
+            while True:
+                message = await receive()
+                await inbox.put(message)
+                if message["type"] == "http.disconnect":
+                    if not started:
+                        # cancel() connects to the server: keep it off the event loop
+                        await loop.run_in_executor(None, guard.cancel)
+                    return
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, inbox.get, send_wrapper)
+        finally:
+            watcher.cancel()
+            _current.reset(token)
+            limiter.semaphore.release()
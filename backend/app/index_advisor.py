@@ -0,0 +1,174 @@
+# backend/app/index_advisor.py
+"""
+Index advisor: proposes indexes for the filter shapes the app actually runs.
+
+Input is filters.workload (filter shape -> executions in this worker). For
+every shape that filters property_snapshots columns:
+
+- equality filters (eq / in) become the leading key columns, the most used
+  first so that shapes share prefixes; boolean flags are left out (too few
+  distinct values to be worth a key column),
+- then the most used range column (ge / le): a btree range-scans only on the
+  last column it uses, so equality first, range last,
+- INCLUDE (snapshot_id, property_id, price_per_m2), the join keys and the
+  aggregated column, so the analytics scans can be index-only.
+
+A proposal whose key columns are a prefix of another one is folded into it
+(the longer index serves both), and one that an existing index already
+starts with is skipped. ILIKE '%...%' filters cannot use a btree; their
+columns are reported as pg_trgm GIN candidates. area lives on properties
+and gets a single-column proposal there.
+
+Drop candidates are indexes of property_snapshots that are a prefix of
+another index, or (Postgres) were never scanned since the last statistics
+reset and back no constraint.
+
+    GET /debug/index_advice      DELETE /debug/index_advice (reset counts)
+"""
+import os
+from collections import Counter
+
+from sqlalchemy import inspect, text
+
+from . import models
+from .filters import ANNOTATION_OPS, FILTERS, workload
+
+PS_TABLE = models.PropertySnapshot.__table__
+COVERING = ("snapshot_id", "property_id", "price_per_m2")
+MAX_KEY_COLUMNS = 4
+# shapes with a smaller share of all executions are ignored
+MIN_SHARE = float(os.getenv("INDEX_ADVISOR_MIN_SHARE", "0.01"))
+
+UNUSED_SQL = text(
+    "SELECT s.indexrelname AS name, s.idx_scan AS scans, pg_relation_size(s.indexrelid) AS bytes "
+    "FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid "
+    "WHERE s.relname = :table AND s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary"
+)
+
+
+def shape_columns(shape: tuple):
+    """(equality columns, range columns, ILIKE columns, properties columns) of a shape."""
+    eq, rng, like, other = [], [], [], []
+    for entry in shape:
+        column, op = FILTERS[entry.lstrip("!")]
+        if op in ANNOTATION_OPS or op == "flag":
+            continue
+        if column.table is not PS_TABLE:
+            target = other
+        elif op in ("eq", "in"):
+            target = eq
+        elif op in ("ge", "le"):
+            target = rng
+        else:
+            target = like
+        if column.name not in target:
+            target.append(column.name)
+    return eq, rng, like, other
+
+
+def _index_name(table: str, columns) -> str:
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def _ddl(table, columns, include=(), using=None, ops=""):
+    name = _index_name(table, columns) + ("_trgm" if using else "")
+    cols = ", ".join(f"{c}{ops}" for c in columns)
+    sql = f"CREATE INDEX CONCURRENTLY {name} ON {table}"
+    sql += f" USING {using} ({cols})" if using else f" ({cols})"
+    if include:
+        sql += f" INCLUDE ({', '.join(include)})"
+    return name, sql
+
+
+def _covered(columns, existing) -> bool:
+    return any(list(columns) == cols[:len(columns)] for cols in existing)
+
+
+def propose(counts: dict, existing: dict):
+    """counts: shape -> executions; existing: table -> [column lists of its indexes]."""
+    total = sum(counts.values())
+    shapes = {s: n for s, n in counts.items() if total and n / total >= MIN_SHARE}
+
+    eq_use, rng_use = Counter(), Counter()
+    for shape, n in shapes.items():
+        eq, rng, _, _ = shape_columns(shape)
+        eq_use.update({c: n for c in eq})
+        rng_use.update({c: n for c in rng})
+
+    keys, trigram, other = Counter(), Counter(), Counter()
+    for shape, n in shapes.items():
+        eq, rng, like, props = shape_columns(shape)
+        key = sorted(eq, key=lambda c: (-eq_use[c], c))[:MAX_KEY_COLUMNS - 1]
+        if rng:
+            key.append(max(rng, key=lambda c: (rng_use[c], c)))
+        if key:
+            keys[tuple(key)] += n
+        trigram.update({c: n for c in like})
+        other.update({c: n for c in props})
+
+    # fold prefixes into the longer index, shortest first
+    for key in sorted(keys, key=len):
+        longer = [k for k in keys if len(k) > len(key) and k[:len(key)] == key]
+        if longer:
+            target = max(longer, key=lambda k: keys[k])
+            keys[target] += keys.pop(key)
+
+    out = []
+    for key, n in keys.most_common():
+        if _covered(key, existing.get(PS_TABLE.name, ())):
+            continue
+        include = [c for c in COVERING if c not in key]
+        name, ddl = _ddl(PS_TABLE.name, key, include)
+        out.append({"index": name, "columns": list(key), "include": include, "executions": n, "ddl": ddl})
+    for column, n in trigram.most_common():
+        name, ddl = _ddl(PS_TABLE.name, [column], using="gin", ops=" gin_trgm_ops")
+        out.append({"index": name, "columns": [column], "include": [], "executions": n, "ddl": ddl,
+                    "note": "ILIKE '%...%' needs pg_trgm (CREATE EXTENSION pg_trgm)"})
+    table = models.Property.__table__.name
+    for column, n in other.most_common():
+        if _covered([column], existing.get(table, ())):
+            continue
+        name, ddl = _ddl(table, [column])
+        out.append({"index": name, "columns": [column], "include": [], "executions": n, "ddl": ddl})
+    return out
+
+
+def redundant(indexes):
+    """Indexes whose columns are a prefix of another index's columns."""
+    out = []
+    for ix in indexes:
+        cols = ix["column_names"]
+        wider = [o for o in indexes if o is not ix and len(o["column_names"]) > len(cols)
+                 and o["column_names"][:len(cols)] == cols]
+        if wider and not ix.get("unique"):
+            out.append({"index": ix["name"], "reason": f"prefix of {wider[0]['name']}",
+                        "ddl": f"DROP INDEX CONCURRENTLY {ix['name']}"})
+    return out
+
+
+def advise(db):
+    inspector = inspect(db.get_bind())
+    indexes = inspector.get_indexes(PS_TABLE.name)
+    existing = {
+        PS_TABLE.name: [ix["column_names"] for ix in indexes],
+        models.Property.__table__.name: [
+            ix["column_names"] for ix in inspector.get_indexes(models.Property.__table__.name)
+        ],
+    }
+    counts = workload.snapshot()
+    drops = redundant(indexes)
+    if db.get_bind().dialect.name == "postgresql":
+        seen = {d["index"] for d in drops}
+        for r in db.execute(UNUSED_SQL, {"table": PS_TABLE.name}):
+            if r.name not in seen:
+                drops.append({"index": r.name, "reason": f"never scanned ({r.bytes} bytes)",
+                              "ddl": f"DROP INDEX CONCURRENTLY {r.name}"})
+    return {
+        "executions": sum(counts.values()),
+        "shapes": [
+            {"shape": list(shape), "executions": n}
+            for shape, n in sorted(counts.items(), key=lambda kv: -kv[1])
+        ],
+        "create": propose(counts, existing),
+        "drop": drops,
+    }
@@ -0,0 +1,321 @@
+# backend/app/ingest.py
+"""
+Snapshot ingest: parse -> de-duplicate -> stage -> publish.
+
+Files (or the members of a zip) are parsed and normalized in parallel in a
+process pool of INGEST_WORKERS processes (default: CPU count), so parse time
+scales with cores. A listing that appears in several files is kept once (the
+last file wins).
+
+Stage: the listings, with their deal scores already computed, are written in
+committed batches to a private staging table (UNLOGGED on Postgres: no WAL,
+and nobody reads it), then checked (row count, unique ext_id index) and
+analyzed there. Nothing a reader queries is touched yet.
+
+Publish: one short transaction of set-based statements from the staging table
+
+- the snapshot row,
+- properties upserted in ext_id order with INSERT ... ON CONFLICT
+  (property_id) DO UPDATE, so concurrent ingests neither duplicate nor
+  deadlock on each other,
+- property_snapshots inserted with their deal scores,
+
+so readers see the complete snapshot or none of it, and the row-by-row
+writes never run inside it. The staging table is dropped whatever happens.
+Planner statistics of the published tables are refreshed afterwards by a
+background ANALYZE, off the request path.
+Progress (files parsed, rows staged) and the new data generation are
+published as server-sent events (app.events).
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import Column, Float, Index, MetaData, String, Table, func, insert, inspect, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import DropTable
+
+from . import columnar, comps, deal_score, events, models, suggest, uploads
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+PROPERTY_COLUMNS = ("title", "url", "area", "typology")
+SNAPSHOT_COLUMNS = (
+    "price", "price_per_m2", "district", "city", "zone", "typology", "agency", "address", "tags",
+    "parking", "elevator", "new_construction", "rented", "trespasse", "image_url", "video_url",
+)
+SCORE_COLUMNS = ("deal_score", "deal_percentile")
+
+STAGING_PREFIX = "ingest_staging_"
+# staging tables left behind by a crashed worker are dropped after this long
+STAGING_MAX_AGE_S = 6 * 3600
+
+_pool = None
+# one ANALYZE at a time; ingests finishing while one is queued share it
+_analyzer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-analyze")
+_analyze_pending = threading.Event()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: never fork a worker that holds DB connections and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def content_hash(files) -> str:
+    """sha256 of a single file, or of the sorted per-file hashes of a batch."""
+    digests = sorted(
+        hashlib.sha256(data).hexdigest() if isinstance(data, bytes) else uploads.file_sha256(data)
+        for _, data in files
+    )
+    if len(digests) == 1:
+        return digests[0]
+    return hashlib.sha256("\n".join(digests).encode()).hexdigest()
+
+
+def expand_archives(files):
+    """[(filename, bytes or path)] with every .zip replaced by its table members."""
+    from .normalize import TABLE_EXTENSIONS
+
+    out = []
+    for name, data in files:
+        if not name.endswith(".zip"):
+            out.append((name, data))
+            continue
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data) if isinstance(data, bytes) else data)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f"{name} is not a valid zip file")
+        members = [
+            m for m in archive.infolist()
+            if not m.is_dir() and m.filename.endswith(TABLE_EXTENSIONS)
+            and not os.path.basename(m.filename).startswith((".", "__MACOSX"))
+        ]
+        if sum(m.file_size for m in members) > uploads.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=400, detail=f"{name} is too large once extracted")
+        out.extend((f"{name}/{m.filename}", archive.read(m)) for m in members)
+    if not out:
+        raise HTTPException(status_code=400, detail="No Excel or CSV files to ingest.")
+    return out
+
+
+async def parse_files(files, progress: events.Progress = None):
+    """Normalized, de-duplicated listings of all files, parsed in parallel."""
+    import pandas as pd
+    from .normalize import parse_file
+
+    loop = asyncio.get_running_loop()
+    # a single file (or a single core) is not worth the inter-process copy
+    executor = _get_pool() if len(files) > 1 and INGEST_WORKERS > 1 else None
+    tasks = [loop.run_in_executor(executor, parse_file, name, data) for name, data in files]
+    try:
+        pending, parsed = set(tasks), 0
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if progress is not None:
+                parsed += sum(len(t.result()) for t in done)
+                # publishing may touch the database: keep it off the event loop
+                await loop.run_in_executor(
+                    None, progress.report, "parse", parsed, None if pending else parsed
+                )
+        # in file order, so the last file wins below
+        frames = [t.result() for t in tasks]
+    except Exception as e:
+        for t in tasks:
+            t.cancel()
+        raise HTTPException(status_code=400, detail=f"Failed to read file: {e}")
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates("ext_id", keep="last").sort_values("ext_id", ignore_index=True)
+
+
+def _records(df, columns):
+    return df[list(columns)].to_dict("records")
+
+
+def _staging_table(db, name: str) -> Table:
+    P, PS = models.Property.__table__, models.PropertySnapshot.__table__
+    return Table(
+        name,
+        MetaData(),
+        Column("ext_id", String, nullable=False),
+        # property columns are prefixed: typology is on both tables
+        *(Column(f"p_{c}", P.c[c].type) for c in PROPERTY_COLUMNS),
+        *(Column(c, PS.c[c].type) for c in SNAPSHOT_COLUMNS),
+        *(Column(c, Float) for c in SCORE_COLUMNS),
+        prefixes=["UNLOGGED"] if db.get_bind().dialect.name == "postgresql" else [],
+    )
+
+
+def _drop_stale_staging(db):
+    cutoff = time.time() - STAGING_MAX_AGE_S
+    for name in inspect(db.connection()).get_table_names():
+        created = name[len(STAGING_PREFIX):].partition("_")[0]
+        if name.startswith(STAGING_PREFIX) and created.isdigit() and int(created) < cutoff:
+            db.execute(DropTable(Table(name, MetaData()), if_exists=True))
+    db.commit()
+
+
+def _scores(df) -> dict:
+    """ext_id -> (deal_score, deal_percentile), computed before anything is written."""
+    rows = list(zip(df["ext_id"], df["price_per_m2"], df["zone"], df["city"], df["typology"]))
+    scores = deal_score.compute_scores(rows)
+    return {
+        ext_id: (round(float(s), 4), round(float(p), 2))
+        for ext_id, s, p in scores.itertuples(index=False)
+    }
+
+
+def create_staging(db) -> Table:
+    """A new, empty staging table (stale ones are dropped first)."""
+    _drop_stale_staging(db)
+    staging = _staging_table(db, f"{STAGING_PREFIX}{int(time.time())}_{uuid.uuid4().hex[:8]}")
+    staging.create(db.connection())
+    db.commit()
+    return staging
+
+
+def stage(db, staging: Table, df, progress: events.Progress = None):
+    """Writes the listings to the staging table, then indexes and checks it."""
+    scores = _scores(df)
+    rows = [
+        {
+            "ext_id": ext_id,
+            **{f"p_{c}": v for c, v in prop.items()},
+            **values,
+            **dict(zip(SCORE_COLUMNS, scores.get(ext_id, (None, None)))),
+        }
+        for ext_id, prop, values in zip(
+            df["ext_id"], _records(df, PROPERTY_COLUMNS), _records(df, SNAPSHOT_COLUMNS)
+        )
+    ]
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        db.execute(insert(staging), batch)
+        # a private table: committing per batch keeps every transaction short
+        db.commit()
+        if progress is not None:
+            progress.report("write", start + len(batch), len(rows))
+
+    # built after the load (cheaper than maintaining it per batch); unique = no duplicate listings
+    Index(f"{staging.name}_ext_id", staging.c.ext_id, unique=True).create(db.connection())
+    staged = db.execute(select(func.count()).select_from(staging)).scalar()
+    if staged != len(rows):
+        raise HTTPException(status_code=500, detail=f"Staged {staged} of {len(rows)} listings")
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"ANALYZE {staging.name}"))
+    db.commit()
+
+
+def publish(db, staging: Table, content_hash: str = None):
+    """Snapshot row, properties and listings from the staging table, in one transaction."""
+    P, PS = models.Property.__table__, models.PropertySnapshot.__table__
+    snapshot = models.Snapshot(upload_date=datetime.utcnow(), content_hash=content_hash)
+    db.add(snapshot)
+    try:
+        # the unique content_hash also catches concurrent duplicates
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="This file was already ingested")
+
+    # existing rows keep old values where the export has none
+    upsert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    properties = upsert(P).from_select(
+        ["property_id", *PROPERTY_COLUMNS],
+        select(staging.c.ext_id, *(staging.c[f"p_{c}"] for c in PROPERTY_COLUMNS))
+        # the WHERE also keeps SQLite from reading ON CONFLICT as a join constraint
+        .where(staging.c.ext_id.isnot(None))
+        .order_by(staging.c.ext_id),
+    )
+    db.execute(properties.on_conflict_do_update(
+        index_elements=[P.c.property_id],
+        set_={c: func.coalesce(properties.excluded[c], P.c[c]) for c in PROPERTY_COLUMNS},
+    ))
+
+    columns = SNAPSHOT_COLUMNS + SCORE_COLUMNS
+    db.execute(insert(PS).from_select(
+        ["snapshot_id", "property_id", *columns],
+        select(literal(snapshot.id), P.c.id, *(staging.c[c] for c in columns))
+        .select_from(staging.join(P, P.c.property_id == staging.c.ext_id)),
+    ))
+    db.commit()
+
+    if db.get_bind().dialect.name == "postgresql" and not _analyze_pending.is_set():
+        # a snapshot adds a lot of rows at once: don't wait for autovacuum to notice
+        _analyze_pending.set()
+        _analyzer.submit(_analyze, db.get_bind())
+    return snapshot
+
+
+def _analyze(engine):
+    """Refreshes planner statistics of the published tables."""
+    _analyze_pending.clear()
+    P, PS = models.Property.__table__, models.PropertySnapshot.__table__
+    try:
+        with engine.connect() as conn:
+            conn.execute(text(f"ANALYZE {PS.name}, {P.name}"))
+            conn.commit()
+    except Exception as e:
+        logger.warning("ANALYZE after ingest failed: %s", e)
+
+
+def load_snapshot(db, df, content_hash: str = None, progress: events.Progress = None):
+    """Stages the listings, then publishes them as one snapshot."""
+    staging = create_staging(db)
+    try:
+        stage(db, staging, df, progress)
+        if progress is not None:
+            progress.report("publish", 0, len(df))
+        snapshot = publish(db, staging, content_hash)
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.execute(DropTable(staging, if_exists=True))
+        db.commit()
+
+    after_ingest(db, snapshot.id)
+    if progress is not None:
+        progress.report("done", len(df), len(df))
+    return snapshot
+
+
+def after_ingest(db, snapshot_id: int):
+    """Derived data that follows the snapshot set (deal scores are published with the rows)."""
+    columnar.get_store(db, force=True)
+    comps.index.invalidate()
+    suggest.index.invalidate()
+    events.publish_generation(db)
+
+
+def after_delete(db):
+    columnar.get_store(db, force=True)
+    comps.index.invalidate()
+    suggest.index.invalidate()
+    events.publish_generation(db)
@@ -1,35 +1,53 @@
 # backend/app/main.py
+import os
+import time
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
+from sqlalchemy.exc import OperationalError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
-from app.routes import properties, snapshots, annotations, analytics
-from app.database import engine, Base, SessionLocal
-from app import models
-from datetime import datetime
-from sqlalchemy.orm import Session
-
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+from app.routes import properties, snapshots, annotations, analytics, debug, events as events_routes, metrics as metrics_routes
+from app import database
+from app import bootstrap, events, guard, ingest, metrics, profiling, retention, slow_queries
 
 
 # ---- Lifespan handler (replaces deprecated on_event) ----
+# Schema / seed run here (once, under an advisory lock) instead of at import
+# time, so every worker imports quickly and only one does the bootstrap work.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("=== Registered Routes at Startup ===")
-    for route in app.routes:
-        print(f"Path: {route.path} | Name: {route.name}")
+    await run_in_threadpool(bootstrap.bootstrap)
+    bootstrap.timings["total"] = round(time.perf_counter() - _import_started, 4)
+    phases = " | ".join(f"{k} {v:.3f}s" for k, v in bootstrap.timings.items())
+    print(f"[startup pid={os.getpid()}] {phases}")
+    # LISTEN for events published by the other workers
+    events.start()
+    # periodic snapshot compaction, if RETENTION_INTERVAL_H is set
+    retention.start()
 
     yield  # app runs here
 
     # Shutdown
-    print("Shutting down...")
+    events.stop()
+    retention.stop()
+    ingest.shutdown()
+    for e in database.engines():
+        e.dispose()
 
 
 # ---- App ----
 app = FastAPI(title="Property Analytics", lifespan=lifespan)
 
+# Deadlines, disconnect cancellation and load shedding for /properties and
+# /analytics; inside CORS so its 503 / 504 responses carry the CORS headers
+app.add_middleware(guard.GuardMiddleware)
+app.add_exception_handler(OperationalError, guard.operational_error_handler)
+app.add_exception_handler(guard.ClientDisconnected, guard.client_disconnected_handler)
+
 # CORS setup
 origins = [
     "http://localhost:3000",   # local dev
@@ -42,62 +60,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id", "X-Archived-Months"],
 )
 
+# Per-request latency / SQL counters, exposed at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+for e in database.engines():
+    metrics.install_engine_hooks(e)
+    # Statements over SLOW_QUERY_MS land in /debug/slow_queries (with sampled plans)
+    slow_queries.install_engine_hooks(e)
+    profiling.install_engine_hooks(e)
+
+# Requests carrying PROFILE_TOKEN are profiled into /debug/profiles; outermost,
+# so the profile covers every other middleware too
+app.add_middleware(profiling.ProfileMiddleware)
+
 
 # ---- Routers ----
 app.include_router(properties.router, prefix="/properties", tags=["Properties"])
 app.include_router(snapshots.router, prefix="/snapshots", tags=["Snapshots"])
 app.include_router(annotations.router, prefix="/annotations", tags=["Annotations"])
 app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(events_routes.router, tags=["Events"])
+app.include_router(metrics_routes.router, tags=["Metrics"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"])
 
-
-# ---- Auto-seed fake data ----
-def seed_data():
-    db: Session = SessionLocal()
-    if db.query(models.Snapshot).count() == 0:
-        snap = models.Snapshot(upload_date=datetime.utcnow())
-        db.add(snap)
-        db.commit()
-        db.refresh(snap)
-
-        fake_props = [
-            {
-                "property_id": f"FAKE{i}",
-                "title": f"Shop {i} in Porto",
-                "url": "https://www.idealista.pt/en/",
-                "area": 100 + i*10,
-                "typology": "Loja",
-                "price": 100000 + i*5000,
-                "price_per_m2": 1000 + i*50,
-                "image_url": "https://via.placeholder.com/150"
-            }
-            for i in range(1, 6)
-        ]
-
-        for p in fake_props:
-            prop = models.Property(
-                property_id=p["property_id"],
-                title=p["title"],
-                url=p["url"],
-                area=p["area"],
-                typology=p["typology"],
-            )
-            db.add(prop)
-            db.commit()
-            db.refresh(prop)
-
-            snap_data = models.PropertySnapshot(
-                snapshot_id=snap.id,
-                property_id=prop.id,
-                price=p["price"],
-                price_per_m2=p["price_per_m2"],
-                raw_json=str(p)
-            )
-            db.add(snap_data)
-
-        db.commit()
-    db.close()
-
-
-seed_data()
+bootstrap.timings["import"] = round(time.perf_counter() - _import_started, 4)
@@ -0,0 +1,278 @@
+# backend/app/metrics.py
+"""
+Request-level performance instrumentation.
+
+- MetricsMiddleware times every HTTP request and counts response bytes.
+- install_engine_hooks() attaches SQLAlchemy cursor events that add the
+  statement count, DB time and rows returned to the current request.
+- render() exposes everything in the Prometheus text format (served at /metrics).
+
+Series are labelled by route template and "filter shape" (the sorted names of
+the query params that were sent, never their values), so e.g.
+/properties/ with city+min_price is tracked apart from an unfiltered listing.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from . import statements
+
+# Add a Server-Timing header (db / app durations) to every response
+SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# params that shape the response but are not filters
+_SHAPE_IGNORE = {"fields", "include"}
+
+
+class RequestStats:
+    __slots__ = ("sql_count", "db_time", "rows")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+# ---- Registry ----
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}     # labels -> _Histogram (seconds)
+        self.statements = {}  # labels -> _Histogram (statements per request)
+        self.counters = {}    # (name, labels) -> float
+        self.compile_cache = {}  # SQLAlchemy compiled cache result -> count
+
+    def record(self, method, route, shape, status, duration, stats, response_bytes):
+        labels = (method, route, shape)
+        with self._lock:
+            self.latency.setdefault(labels, _Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.statements.setdefault(labels, _Histogram(STATEMENT_BUCKETS)).observe(stats.sql_count)
+            for name, value in (
+                ("http_requests_total", 1),
+                ("http_request_db_seconds_total", stats.db_time),
+                ("http_request_db_rows_total", stats.rows),
+                ("http_response_bytes_total", response_bytes),
+            ):
+                key = (name, labels + (str(status),))
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def record_compile(self, result: str):
+        with self._lock:
+            self.compile_cache[result] = self.compile_cache.get(result, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.statements.clear()
+            self.counters.clear()
+            self.compile_cache.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            _render_histogram(
+                lines, "http_request_duration_seconds",
+                "Request latency by route and filter shape.", self.latency,
+            )
+            _render_histogram(
+                lines, "http_request_sql_statements",
+                "SQL statements executed per request.", self.statements,
+            )
+            helps = {
+                "http_requests_total": "Requests served.",
+                "http_request_db_seconds_total": "Time spent in SQL statements.",
+                "http_request_db_rows_total": "Rows returned by SQL statements.",
+                "http_response_bytes_total": "Response body bytes sent.",
+            }
+            for name, help_text in helps.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(labels, with_status=True)} {_num(value)}")
+
+            lines.append("# HELP sqlalchemy_compiled_cache_total SQLAlchemy compiled cache lookups by result.")
+            lines.append("# TYPE sqlalchemy_compiled_cache_total counter")
+            for result, value in sorted(self.compile_cache.items()):
+                lines.append(f'sqlalchemy_compiled_cache_total{{result="{result}"}} {value}')
+
+        lines.append("# HELP statement_cache_lookups_total Per-shape statement cache lookups.")
+        lines.append("# TYPE statement_cache_lookups_total counter")
+        for name, cache in sorted(statements.caches.items()):
+            lines.append(f'statement_cache_lookups_total{{cache="{name}",result="hit"}} {cache.hits}')
+            lines.append(f'statement_cache_lookups_total{{cache="{name}",result="miss"}} {cache.misses}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, with_status=False, extra=None) -> str:
+    names = ["method", "route", "shape"] + (["status"] if with_status else [])
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(names, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _num(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_histogram(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, h in sorted(series.items()):
+        for upper, count in zip(h.buckets, h.counts):
+            le = 'le="%s"' % upper
+            lines.append(f"{name}_bucket{_labels(labels, extra=le)} {count}")
+        inf = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(labels, extra=inf)} {h.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_num(h.total)}")
+        lines.append(f"{name}_count{_labels(labels)} {h.count}")
+
+
+registry = Registry()
+
+
+def render() -> str:
+    return registry.render()
+
+
+# ---- SQLAlchemy hooks ----
+def install_engine_hooks(engine):
+    def _after(conn, cursor, statement, parameters, context, executemany, started, duration):
+        if context is not None:
+            # CacheStats.CACHE_HIT -> "cache_hit", CACHE_MISS -> "cache_miss", ...
+            hit = context.cache_hit
+            registry.record_compile(getattr(hit, "name", str(hit)).lower())
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.sql_count += 1
+        stats.db_time += duration
+        if cursor.description is not None and cursor.rowcount and cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
+
+    statements.on_statement(engine, _after)
+
+
+# ---- ASGI middleware ----
+_route_params = {}  # id(route) -> declared query param names (routes live as long as the app)
+
+
+def _query_param_names(dependant):
+    names = {p.alias for p in dependant.query_params}
+    for sub in dependant.dependencies:
+        names |= _query_param_names(sub)
+    return names
+
+
+def _declared_params(route) -> frozenset:
+    key = id(route)
+    if key not in _route_params:
+        dependant = getattr(route, "dependant", None)
+        names = _query_param_names(dependant) if dependant is not None else set()
+        _route_params[key] = frozenset(names - _SHAPE_IGNORE)
+    return _route_params[key]
+
+
+def route_template(scope) -> str:
+    """/properties/12/history -> /properties/{property_id}/history"""
+    if scope.get("route") is None:
+        return "<unmatched>"
+    by_value = {str(v): k for k, v in scope.get("path_params", {}).items()}
+    return "/".join(
+        "{%s}" % by_value[seg] if seg in by_value else seg
+        for seg in scope["path"].split("/")
+    )
+
+
+def filter_shape(query_string: bytes, allowed) -> str:
+    # only declared params count, so arbitrary client params can't explode label cardinality
+    names = set()
+    for part in query_string.decode("latin-1").split("&"):
+        name, _, value = part.partition("=")
+        if value and name in allowed:
+            names.add(name)
+    return ",".join(sorted(names)) or "-"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # /events streams for as long as the client stays; not a request latency
+        if scope["type"] != "http" or scope["path"] in ("/metrics", "/events"):
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.sql_count} queries", '
+                        f"app;dur={total_ms:.1f}"
+                    )
+                    message.setdefault("headers", []).append((b"server-timing", timing.encode()))
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            registry.record(
+                scope["method"],
+                route_template(scope),
+                filter_shape(
+                    scope.get("query_string", b""),
+                    _declared_params(route) if route is not None else frozenset(),
+                ),
+                status,
+                time.perf_counter() - started,
+                stats,
+                sent,
+            )
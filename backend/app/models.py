@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint, func, literal_column
+from sqlalchemy.orm import relationship, deferred
 from .database import Base
 
 class Property(Base):
@@ -9,7 +9,7 @@ class Property(Base):
     property_id = Column(String, unique=True, index=True, nullable=False)
     title = Column(String, nullable=True)
     url = Column(String, nullable=True)
-    area = Column(Float, nullable=True)
+    area = Column(Float, index=True, nullable=True)
     typology = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
@@ -25,30 +25,71 @@ class Snapshot(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     upload_date = Column(DateTime, server_default=func.now())
+    # sha256 of the uploaded file; identical re-uploads are refused
+    content_hash = Column(String(64), nullable=True)
 
     snapshots = relationship(
         "PropertySnapshot", back_populates="snapshot", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        UniqueConstraint("content_hash", name="uq_snapshots_content_hash"),
+    )
+
+class ArchivedSnapshot(Base):
+    """A snapshot compacted away by app.retention; its rows live in archive_path (Parquet)."""
+    __tablename__ = "archived_snapshots"
+
+    # the snapshot's original id, so a restore gets it back unchanged
+    id = Column(Integer, primary_key=True)
+    upload_date = Column(DateTime, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)
+    rows = Column(Integer, nullable=False)
+    archive_path = Column(String, nullable=False)
+    archived_at = Column(DateTime, server_default=func.now())
+
+class SnapshotRollup(Base):
+    """Per-segment aggregates of an archived snapshot, kept in the database."""
+    __tablename__ = "snapshot_rollups"
+
+    id = Column(Integer, primary_key=True)
+    snapshot_id = Column(Integer, ForeignKey("archived_snapshots.id", ondelete="CASCADE"), nullable=False, index=True)
+    upload_date = Column(DateTime, nullable=False, index=True)
+    district = Column(String, nullable=True)
+    city = Column(String, nullable=True)
+    zone = Column(String, nullable=True)
+    typology = Column(String, nullable=True)
+
+    listings = Column(Integer, nullable=False)
+    avg_price = Column(Float, nullable=True)
+    avg_price_per_m2 = Column(Float, nullable=True)
+    min_price_per_m2 = Column(Float, nullable=True)
+    median_price_per_m2 = Column(Float, nullable=True)
+    max_price_per_m2 = Column(Float, nullable=True)
+
 class PropertySnapshot(Base):
     __tablename__ = "property_snapshots"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     snapshot_id = Column(Integer, ForeignKey("snapshots.id", ondelete="CASCADE"), nullable=False)
     property_id = Column(Integer, ForeignKey("properties.id", ondelete="CASCADE"), nullable=False)
 
-    price = Column(Float, nullable=True)
-    price_per_m2 = Column(Float, nullable=True)
+    price = Column(Float, index=True, nullable=True)
+    price_per_m2 = Column(Float, index=True, nullable=True)
     status = Column(String, nullable=True)
-    raw_json = Column(Text, nullable=True)
-
-    district = Column(String, index=True, nullable=True)
-    city = Column(String, index=True, nullable=True)
-    zone = Column(String, index=True, nullable=True)
-    typology = Column(String, index=True, nullable=True)
+    # (segment median - price_per_m2) / robust std, computed at ingest (app.deal_score)
+    deal_score = Column(Float, nullable=True)
+    deal_percentile = Column(Float, nullable=True)
+    # rarely read and potentially large: only loaded when explicitly asked for
+    raw_json = deferred(Column(Text, nullable=True))
+
+    district = Column(String, nullable=True)
+    city = Column(String, nullable=True)
+    zone = Column(String, nullable=True)
+    typology = Column(String, nullable=True)
     agency = Column(String, index=True, nullable=True)
-    address = Column(String, index=True, nullable=True)
-    tags = Column(String, index=True, nullable=True)
+    address = Column(String, nullable=True)
+    tags = Column(String, nullable=True)
 
     parking = Column(Boolean, server_default="false")
     elevator = Column(Boolean, server_default="false")
@@ -62,6 +103,27 @@ class PropertySnapshot(Base):
     property = relationship("Property", back_populates="snapshots")
     snapshot = relationship("Snapshot", back_populates="snapshots")
 
+    __table_args__ = (
+        # per-property history lookups: WHERE property_id IN (...) ORDER BY snapshot_id
+        Index("ix_property_snapshots_property_id_snapshot_id", "property_id", "snapshot_id"),
+        # best deals of the current snapshot: WHERE snapshot_id = ? ORDER BY deal_score DESC LIMIT n
+        Index("ix_property_snapshots_snapshot_id_deal_score", "snapshot_id", "deal_score"),
+        # filter shapes recorded by app.filters.workload (see app.index_advisor):
+        # equality columns first, the analytics inputs covered
+        Index(
+            "ix_property_snapshots_district_city_zone", "district", "city", "zone",
+            postgresql_include=["snapshot_id", "property_id", "price_per_m2"],
+        ),
+        Index(
+            "ix_property_snapshots_city_typology", "city", "typology",
+            postgresql_include=["snapshot_id", "property_id", "price_per_m2"],
+        ),
+        Index(
+            "ix_property_snapshots_zone_typology", "zone", "typology",
+            postgresql_include=["snapshot_id", "property_id", "price_per_m2"],
+        ),
+    )
+
 class Annotation(Base):
     __tablename__ = "annotations"
 
@@ -70,5 +132,18 @@ class Annotation(Base):
     reviewed = Column(Boolean, default=False)
     contacted = Column(Boolean, default=False)
     notes = Column(Text, nullable=True)
+    # "Yes" / "No" / NULL
+    interesting = Column(String(10), index=True, nullable=True)
 
     property = relationship("Property", back_populates="annotations")
+
+    __table_args__ = (
+        # one annotation row per property; target of the bulk upsert's ON CONFLICT
+        UniqueConstraint("property_id", name="uq_annotations_property_id"),
+        # search_notes filter (app.filters.NOTES_TSVECTOR)
+        Index(
+            "ix_annotations_notes_fts",
+            func.to_tsvector(literal_column("'simple'"), func.coalesce(notes, literal_column("''"))),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
@@ -0,0 +1,82 @@
+# backend/app/normalize.py
+"""
+Export file -> normalized listing table.
+
+Pure pandas, no database or app imports: parse_file() runs in ingest worker
+processes (app.ingest), which only need to import this module.
+"""
+import io
+
+import pandas as pd
+
+# export column -> normalized column
+SOURCE_COLUMNS = {
+    "id": "ext_id",
+    "title": "title",
+    "href": "url",
+    "area": "area",
+    "typology": "typology",
+    "price": "price",
+    "price_per_m2": "price_per_m2",
+    "Distrito": "district",
+    "Concelho": "city",
+    "Zone": "zone",
+    "agency": "agency",
+    "address": "address",
+    "tag": "tags",
+    "parking": "parking",
+    "elevador": "elevator",
+    "nova_construcao": "new_construction",
+    "arrendada": "rented",
+    "trespasse": "trespasse",
+    "image_url": "image_url",
+    "video_url": "video_url",
+    # "Tipo","Sub-tipo","Sub Tipo" -> ignore for now
+}
+NUMBERS = ("area", "price", "price_per_m2")
+FLAGS = ("parking", "elevator", "new_construction", "rented", "trespasse")
+TRUE_VALUES = ("1", "true", "yes", "y", "sim")
+
+TABLE_EXTENSIONS = (".xlsx", ".xls", ".csv")
+
+
+def read_table(filename: str, source) -> pd.DataFrame:
+    """source: path or file-like object. External ids are kept as text."""
+    if filename.endswith(".csv"):
+        return pd.read_csv(source, dtype={"id": str})
+    return pd.read_excel(source, dtype={"id": str})
+
+
+def _text(col: pd.Series) -> pd.Series:
+    if col.dtype != object:
+        # e.g. an all-numeric zone column
+        col = col.astype(str).where(col.notna())
+    return col.astype(object).where(col.notna(), None)
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per listing with the normalized columns; rows without an external
+    id are dropped. Missing optional columns become NULL.
+    """
+    out = pd.DataFrame(index=df.index)
+    for src, dst in SOURCE_COLUMNS.items():
+        col = df[src] if src in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if dst in NUMBERS:
+            out[dst] = pd.to_numeric(col, errors="coerce").astype(object)
+            out[dst] = out[dst].where(out[dst].notna(), None)
+        elif dst in FLAGS:
+            flags = col.astype(str).str.strip().str.lower().isin(TRUE_VALUES).astype(object)
+            out[dst] = flags.where(col.notna(), None)
+        else:
+            out[dst] = _text(col)
+
+    ext_id = out["ext_id"].str.strip()
+    out["ext_id"] = ext_id
+    return out[ext_id.notna() & (ext_id != "")].reset_index(drop=True)
+
+
+def parse_file(filename: str, data) -> pd.DataFrame:
+    """data: the file's bytes, or the path of a file on disk (read from there)."""
+    source = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    return normalize(read_table(filename, source))
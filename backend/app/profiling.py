@@ -0,0 +1,286 @@
+# backend/app/profiling.py
+"""
+On-demand request profiling.
+
+A request is profiled when PROFILE_TOKEN is set and the request carries it,
+as an X-Profile header or a ?profile= query param (prefer the header: query
+strings end up in access logs). Other requests only pay for a header lookup.
+
+While the request runs, a sampler thread records the Python stacks of the
+threads working for it every PROFILE_INTERVAL_MS:
+
+- the event loop thread (routing, async handlers, JSON encoding), unless it
+  is idle in select(); coroutines of other requests interleaved on the loop
+  can show up there too,
+- worker threads running its sync handlers, dependencies and response
+  validation: Starlette runs those through anyio in a copy of the request's
+  context, so a worker is the request's while that context holds the profile.
+
+Every SQL statement the request runs is recorded as a span (fingerprint,
+thread, start, duration).
+
+The last PROFILE_KEEP profiles (none older than PROFILE_RETENTION_S) are kept
+in memory; the response carries the id in X-Profile-Id:
+
+    GET /debug/profiles                           recent profiles
+    GET /debug/profiles/{id}?format=speedscope    https://www.speedscope.app
+    GET /debug/profiles/{id}?format=collapsed     flamegraph.pl input
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import Context, ContextVar
+from datetime import datetime
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from . import statements
+from .slow_queries import fingerprint
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+INTERVAL_S = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+RETENTION_S = float(os.getenv("PROFILE_RETENTION_S", "3600"))
+# a bound on memory for requests that run for minutes
+MAX_SAMPLES = int(os.getenv("PROFILE_MAX_SAMPLES", "50000"))
+
+FORMATS = ("speedscope", "collapsed")
+
+_current: ContextVar[Optional["Profile"]] = ContextVar("profile", default=None)
+
+
+class Profile:
+    def __init__(self, method: str, path: str, loop_ident: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.loop_ident = loop_ident
+        self.frames = {}        # (name, file, line) -> index
+        self.samples = []       # (thread, weight ms, (frame index, ...) root first)
+        self.spans = []         # (thread, statement fingerprint, start ms, duration ms)
+
+    def offset_ms(self, t: float) -> float:
+        return (t - self.started) * 1000
+
+    def thread_name(self, ident: int, name: str) -> str:
+        return "event loop" if ident == self.loop_ident else name
+
+    def add_sample(self, thread: str, weight_ms: float, frame, root=None):
+        """frame: innermost; root: outermost frame to keep (default: the thread's first)."""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+            stack.append(self.frames.setdefault(key, len(self.frames)))
+            if frame is root:
+                break
+            frame = frame.f_back
+        stack.reverse()
+        self.samples.append((thread, weight_ms, tuple(stack)))
+
+    def finish(self):
+        self.duration_ms = self.offset_ms(time.perf_counter())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms or 0, 2),
+            "samples": len(self.samples),
+            "sql_count": len(self.spans),
+            "sql_ms": round(sum(s[3] for s in self.spans), 2),
+        }
+
+
+# ---- Sampling ----
+def _request_root(frame, profile, loop_thread: bool):
+    """(root frame, or None for the whole stack) if the thread works for profile, else False."""
+    if loop_thread:
+        # idle: waiting for I/O in the selector
+        idle = frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py")
+        return False if idle else None
+    f = frame
+    while f is not None:
+        code = f.f_code
+        # anyio's WorkerThread.run: context.run(func, *args)
+        if code.co_name == "run" and "context" in code.co_varnames:
+            context = f.f_locals.get("context")
+            return f if isinstance(context, Context) and context.get(_current) is profile else False
+        f = f.f_back
+    return False
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: Profile):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.profile = profile
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stopping.wait(INTERVAL_S) and len(self.profile.samples) < MAX_SAMPLES:
+            now = time.perf_counter()
+            weight_ms, last = (now - last) * 1000, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                root = _request_root(frame, self.profile, ident == self.profile.loop_ident)
+                if root is not False:
+                    thread = self.profile.thread_name(ident, names.get(ident, str(ident)))
+                    self.profile.add_sample(thread, weight_ms, frame, root)
+
+
+# ---- SQLAlchemy hooks ----
+def install_engine_hooks(engine):
+    def _after(conn, cursor, statement, parameters, context, executemany, started, duration):
+        profile = _current.get()
+        if profile is None:
+            return
+        profile.spans.append((
+            profile.thread_name(threading.get_ident(), threading.current_thread().name),
+            fingerprint(statement),
+            profile.offset_ms(started),
+            duration * 1000,
+        ))
+
+    statements.on_statement(engine, _after)
+
+
+# ---- Store ----
+class ProfileStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = deque(maxlen=KEEP)
+
+    def _expire(self):
+        cutoff = time.perf_counter() - RETENTION_S
+        while self._profiles and self._profiles[0].started < cutoff:
+            self._profiles.popleft()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._expire()
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            self._expire()
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def summaries(self):
+        with self._lock:
+            self._expire()
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+store = ProfileStore()
+
+
+# ---- Export ----
+def speedscope(profile: Profile) -> dict:
+    """speedscope file: one sampled profile per thread, SQL spans as evented profiles."""
+    frames = [{"name": name, "file": file, "line": line} for name, file, line in profile.frames]
+    end = round(profile.duration_ms or 0, 3)
+
+    by_thread = {}
+    for thread, weight, stack in profile.samples:
+        samples, weights = by_thread.setdefault(thread, ([], []))
+        samples.append(list(stack))
+        weights.append(round(weight, 3))
+    profiles = [
+        {"type": "sampled", "name": thread, "unit": "milliseconds",
+         "startValue": 0, "endValue": end, "samples": samples, "weights": weights}
+        for thread, (samples, weights) in by_thread.items()
+    ]
+
+    sql = {}
+    for thread, statement, start, duration in profile.spans:
+        frames.append({"name": f"SQL {statement[:200]}"})
+        index = len(frames) - 1
+        sql.setdefault(thread, []).extend([
+            {"type": "O", "frame": index, "at": round(start, 3)},
+            {"type": "C", "frame": index, "at": round(start + duration, 3)},
+        ])
+    profiles += [
+        {"type": "evented", "name": f"SQL ({thread})", "unit": "milliseconds",
+         "startValue": 0, "endValue": end, "events": events}
+        for thread, events in sql.items()
+    ]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{profile.method} {profile.path} ({profile.id})",
+        "exporter": "property-analytics",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+
+def collapsed(profile: Profile) -> str:
+    """Brendan Gregg's folded format: "thread;frame;frame <samples>" per stack."""
+    names = [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in profile.frames]
+    counts = Counter(
+        ";".join([thread.replace(";", ":")] + [names[i] for i in stack])
+        for thread, _, stack in profile.samples
+    )
+    return "".join(f"{stack} {n}\n" for stack, n in sorted(counts.items()))
+
+
+# ---- ASGI middleware ----
+def requested(scope) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    value = dict(scope["headers"]).get(b"x-profile", b"").decode("latin-1")
+    if not value:
+        value = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"))).get("profile", "")
+    return bool(value) and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+class ProfileMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], threading.get_ident())
+        token = _current.set(profile)
+        sampler = _Sampler(profile)
+        sampler.start()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message.setdefault("headers", []).append((b"x-profile-id", profile.id.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            sampler.join()
+            profile.finish()
+            _current.reset(token)
+            store.add(profile)
@@ -0,0 +1,371 @@
+# backend/app/retention.py
+"""
+Snapshot retention: compaction to Parquet, with rollups kept in the database.
+
+RETENTION_POLICY is a list of tiers, youngest first, "<keep>:<max age>":
+
+    RETENTION_POLICY="all:26w,month:2y,year:*"
+
+keeps every snapshot up to 26 weeks old, then the latest snapshot of each
+month up to 2 years, then the latest of each year. keep is all | week | month
+| year; ages take d, w, mo or y; "*" means no limit. Snapshots past the last
+tier are archived too. The newest snapshot is always kept. The default
+("all:*") keeps everything.
+
+Compacting a snapshot:
+
+1. its rows (plus the listing's external id) are written to
+   ARCHIVE_DIR/snapshot_<id>.parquet,
+2. per-segment aggregates (district, city, zone, typology) go to
+   snapshot_rollups and the snapshot to archived_snapshots, in one transaction;
+   the monthly analytics routes read them for the archived periods,
+3. its property_snapshots rows are deleted in batches of RETENTION_BATCH_SIZE,
+   each in its own short transaction, so the hot table is never locked for
+   long (readers may briefly see a partly deleted snapshot),
+4. the snapshot row itself is removed.
+
+Each step can be re-run, so an interrupted job just continues next time. Only
+one worker runs the job at a time (Postgres advisory lock).
+
+    python -m app.retention [--dry-run]     # compact per RETENTION_POLICY
+    python -m app.retention restore <id>    # load an archived snapshot back
+
+Archives can also be queried in place, e.g. read_archive() into pandas, or
+DuckDB over ARCHIVE_DIR/*.parquet.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import Boolean, Float, Integer, bindparam, delete, func, insert, literal, select, text
+
+from . import models
+from .database import SessionLocal, engine
+
+POLICY = os.getenv("RETENTION_POLICY", "all:*")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+# pause between delete batches, leaves room for the regular traffic
+BATCH_PAUSE_S = float(os.getenv("RETENTION_BATCH_PAUSE_S", "0.05"))
+# run the job in the background every N hours (0 = only via the CLI)
+INTERVAL_H = float(os.getenv("RETENTION_INTERVAL_H", "0"))
+
+# not the bootstrap key: the job must not wait on (or block) a bootstrap
+ADVISORY_LOCK_KEY = 727_411_002
+
+GRANULARITIES = ("all", "week", "month", "year")
+_AGE = re.compile(r"^(\d+)(d|w|mo|y)$")
+_AGE_DAYS = {"d": 1, "w": 7, "mo": 30, "y": 365}
+
+PS = models.PropertySnapshot
+
+
+# ---- Policy ----
+def parse_policy(value: str):
+    """"all:26w,month:*" -> [("all", timedelta(weeks=26)), ("month", None)]"""
+    tiers = []
+    for part in value.split(","):
+        keep, _, age = part.strip().partition(":")
+        if keep not in GRANULARITIES:
+            raise ValueError(f"RETENTION_POLICY: unknown granularity {keep!r}")
+        if age == "*":
+            max_age = None
+        else:
+            m = _AGE.match(age)
+            if not m:
+                raise ValueError(f"RETENTION_POLICY: bad age {age!r} (e.g. 90d, 26w, 6mo, 2y, *)")
+            max_age = timedelta(days=int(m.group(1)) * _AGE_DAYS[m.group(2)])
+        if tiers and (tiers[-1][1] is None or (max_age is not None and max_age <= tiers[-1][1])):
+            raise ValueError("RETENTION_POLICY: tiers must have increasing ages, '*' last")
+        tiers.append((keep, max_age))
+    return tiers
+
+
+def _period(keep: str, when: datetime):
+    if keep == "week":
+        return when.isocalendar()[:2]
+    if keep == "month":
+        return when.year, when.month
+    return when.year
+
+
+def plan(snapshots, now: datetime = None, policy=None):
+    """snapshots: [(id, upload_date)] -> ids to compact, oldest first."""
+    now = now or datetime.utcnow()
+    policy = parse_policy(POLICY) if policy is None else policy
+    ordered = sorted(snapshots, key=lambda s: (s[1], s[0]), reverse=True)
+    kept_periods = set()
+    compact = []
+    for n, (sid, uploaded) in enumerate(ordered):
+        age = now - uploaded
+        tier = next((t for t in policy if t[1] is None or age <= t[1]), None)
+        if n == 0 or (tier is not None and tier[0] == "all"):
+            continue
+        if tier is not None:
+            # newest first, so the first snapshot seen in a period is its latest
+            period = (tier[0], _period(tier[0], uploaded))
+            if period not in kept_periods:
+                kept_periods.add(period)
+                continue
+        compact.append(sid)
+    return compact[::-1]
+
+
+# ---- Archive files ----
+def archive_path(snapshot_id: int) -> str:
+    return os.path.join(ARCHIVE_DIR, f"snapshot_{snapshot_id}.parquet")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    def arrow_type(col):
+        if isinstance(col.type, Integer):
+            return pa.int64()
+        if isinstance(col.type, Float):
+            return pa.float64()
+        if isinstance(col.type, Boolean):
+            return pa.bool_()
+        return pa.string()
+
+    fields = [(c.name, arrow_type(c)) for c in PS.__table__.columns]
+    return pa.schema(fields + [("ext_id", pa.string())])
+
+
+def export_snapshot(db, snapshot_id: int, path: str) -> int:
+    """Writes every row of a snapshot to Parquet, paging by id; returns the row count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    stmt = (
+        select(*PS.__table__.columns, models.Property.property_id.label("ext_id"))
+        .join(models.Property, models.Property.id == PS.property_id)
+        .where(PS.snapshot_id == snapshot_id, PS.id > bindparam("after"))
+        .order_by(PS.id)
+        .limit(BATCH_SIZE)
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    written, after = 0, 0
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        while True:
+            rows = [dict(r._mapping) for r in db.execute(stmt, {"after": after})]
+            if not rows:
+                break
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            written += len(rows)
+            after = rows[-1]["id"]
+    os.replace(tmp, path)
+    return written
+
+
+def read_archive(snapshot_ids=None, columns=None):
+    """Archived rows as one DataFrame (all archives, or just snapshot_ids)."""
+    import pandas as pd
+
+    if snapshot_ids is None:
+        names = sorted(f for f in os.listdir(ARCHIVE_DIR) if f.endswith(".parquet"))
+        paths = [os.path.join(ARCHIVE_DIR, f) for f in names]
+    else:
+        paths = [archive_path(sid) for sid in snapshot_ids]
+    if not paths:
+        return pd.DataFrame(columns=columns or _arrow_schema().names)
+    return pd.concat([pd.read_parquet(p, columns=columns) for p in paths], ignore_index=True)
+
+
+# ---- Compaction ----
+def _median(col):
+    return func.percentile_cont(0.5).within_group(col)
+
+
+def _rollup_statement(snapshot_id: int, upload_date: datetime):
+    segment = (PS.district, PS.city, PS.zone, PS.typology)
+    rollup = select(
+        literal(snapshot_id), literal(upload_date), *segment,
+        func.count(PS.id),
+        func.avg(PS.price),
+        func.avg(PS.price_per_m2),
+        func.min(PS.price_per_m2),
+        _median(PS.price_per_m2),
+        func.max(PS.price_per_m2),
+    ).where(PS.snapshot_id == snapshot_id).group_by(*segment)
+    table = models.SnapshotRollup.__table__
+    return insert(table).from_select(
+        [
+            "snapshot_id", "upload_date", "district", "city", "zone", "typology", "listings",
+            "avg_price", "avg_price_per_m2", "min_price_per_m2", "median_price_per_m2", "max_price_per_m2",
+        ],
+        rollup,
+    )
+
+
+def _delete_rows(db, snapshot_id: int) -> int:
+    batch = select(PS.id).where(PS.snapshot_id == snapshot_id).limit(BATCH_SIZE).scalar_subquery()
+    deleted = 0
+    while True:
+        n = db.execute(delete(PS.__table__).where(PS.__table__.c.id.in_(batch))).rowcount
+        db.commit()
+        if not n:
+            return deleted
+        deleted += n
+        time.sleep(BATCH_PAUSE_S)
+
+
+def compact_snapshot(db, snapshot_id: int) -> int:
+    """Archives one snapshot and removes it from the hot tables; returns rows archived."""
+    snap = db.get(models.Snapshot, snapshot_id)
+    if snap is None:
+        return 0
+    archived = db.get(models.ArchivedSnapshot, snapshot_id)
+    if archived is None:
+        path = archive_path(snapshot_id)
+        rows = export_snapshot(db, snapshot_id, path)
+        archived = models.ArchivedSnapshot(
+            id=snapshot_id, upload_date=snap.upload_date, content_hash=snap.content_hash,
+            rows=rows, archive_path=path,
+        )
+        db.add(archived)
+        db.flush()
+        db.execute(_rollup_statement(snapshot_id, snap.upload_date))
+        db.commit()
+
+    _delete_rows(db, snapshot_id)
+    db.execute(delete(models.Snapshot.__table__).where(models.Snapshot.__table__.c.id == snapshot_id))
+    db.commit()
+    return archived.rows
+
+
+@contextmanager
+def _job_lock():
+    """True when this process may run the job; held on its own connection."""
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect() as conn:
+        got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": ADVISORY_LOCK_KEY}).scalar()
+        try:
+            yield got
+        finally:
+            if got:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": ADVISORY_LOCK_KEY})
+
+
+def run(dry_run: bool = False):
+    """Compacts every snapshot the policy no longer keeps; returns their ids."""
+    from . import ingest
+
+    policy = parse_policy(POLICY)
+    with _job_lock() as got:
+        if not got:
+            print("[retention] another worker is running the job")
+            return []
+        db = SessionLocal()
+        try:
+            snapshots = db.query(models.Snapshot.id, models.Snapshot.upload_date).all()
+            ids = plan(snapshots, policy=policy)
+            if dry_run or not ids:
+                return ids
+            for sid in ids:
+                started = time.perf_counter()
+                rows = compact_snapshot(db, sid)
+                print(f"[retention] snapshot {sid}: {rows} rows archived in {time.perf_counter() - started:.1f}s")
+            # same derived-data refresh as a deleted snapshot
+            ingest.after_delete(db)
+            return ids
+        finally:
+            db.close()
+
+
+def restore(snapshot_id: int) -> int:
+    """Loads an archived snapshot back into the hot tables (one transaction)."""
+    import pyarrow.parquet as pq
+    from . import ingest
+
+    db = SessionLocal()
+    try:
+        archived = db.get(models.ArchivedSnapshot, snapshot_id)
+        if archived is None:
+            raise ValueError(f"snapshot {snapshot_id} is not archived")
+        if db.get(models.Snapshot, snapshot_id) is None:
+            db.execute(insert(models.Snapshot.__table__).values(
+                id=snapshot_id, upload_date=archived.upload_date, content_hash=archived.content_hash,
+            ))
+        # an interrupted compaction may have left part of the rows
+        db.execute(delete(PS.__table__).where(PS.__table__.c.snapshot_id == snapshot_id))
+        restored = 0
+        archive = pq.ParquetFile(archived.archive_path)
+        # columns added since the archive was written are left to their defaults
+        written = set(archive.schema_arrow.names)
+        columns = [c.name for c in PS.__table__.columns if c.name in written]
+        for batch in archive.iter_batches(batch_size=BATCH_SIZE, columns=columns):
+            rows = batch.to_pylist()
+            db.execute(insert(PS.__table__), rows)
+            restored += len(rows)
+        path = archived.archive_path
+        db.execute(delete(models.SnapshotRollup.__table__).where(
+            models.SnapshotRollup.__table__.c.snapshot_id == snapshot_id
+        ))
+        db.delete(archived)
+        db.commit()
+        os.remove(path)
+        ingest.after_delete(db)
+        return restored
+    finally:
+        db.close()
+
+
+# ---- Background job ----
+class Scheduler(threading.Thread):
+    """Runs the job every INTERVAL_H hours; the advisory lock keeps it to one worker."""
+
+    def __init__(self):
+        super().__init__(name="retention", daemon=True)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        while not self._stopping.wait(INTERVAL_H * 3600):
+            try:
+                run()
+            except Exception as e:
+                print(f"[retention] job failed: {e}")
+
+
+_scheduler = None
+
+
+def start():
+    global _scheduler
+    parse_policy(POLICY)  # a bad policy fails at startup, not hours later
+    if INTERVAL_H > 0 and _scheduler is None:
+        _scheduler = Scheduler()
+        _scheduler.start()
+
+
+def stop():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.retention")
+    parser.add_argument("--dry-run", action="store_true", help="only list the snapshots to compact")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("restore").add_argument("snapshot_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "restore":
+        print(f"snapshot {args.snapshot_id}: {restore(args.snapshot_id)} rows restored")
+    else:
+        ids = run(dry_run=args.dry_run)
+        print(f"{'would compact' if args.dry_run else 'compacted'} {len(ids)} snapshots: {ids}")
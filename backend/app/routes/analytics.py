@@ -1,17 +1,143 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import ARRAY, DateTime, Float, Integer, bindparam, case, func, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from types import SimpleNamespace
 from typing import Optional, List
 
-from .. import models, database, schemas
-from .properties import apply_filters
+from .. import columnar, models, database, schemas
+from ..filters import filter_clauses, filter_params, filter_shape
+from ..statements import StatementCache
 
 router = APIRouter()
 
+_statements = StatementCache("analytics")
+
+
+def monthly_rows(db: Session, name: str, aggregates, filters: dict):
+    """
+    Runs `aggregates` grouped by snapshot month. The statement is built once per
+    (route, filter shape) and reused with new bound values. With the columnar
+    store enabled the rows are computed in memory instead.
+    """
+    store = columnar.get_store(db)
+    if store is not None:
+        return store.monthly(name, filters)
+
+    shape = filter_shape(filters)
+
+    def build():
+        month_expr = func.date_trunc("month", models.Snapshot.upload_date).label("month")
+        return (
+            select(month_expr, *aggregates())
+            .select_from(models.PropertySnapshot)
+            .join(models.PropertySnapshot.snapshot)
+            .join(models.PropertySnapshot.property)  # needed for area filter
+            .where(*filter_clauses(shape))
+            .group_by(month_expr)
+            .order_by(month_expr)
+        )
+
+    stmt = _statements.get((name, shape), build)
+    return db.execute(stmt, filter_params(filters, shape)).all()
+
+
+# ---- Archived snapshots (app.retention) ----
+# filters the per-segment rollups can answer; with any other filter archived
+# months are left out and the response says so in ARCHIVED_HEADER
+R = models.SnapshotRollup
+ARCHIVED_HEADER = "X-Archived-Months"
+ROLLUP_FILTERS = {
+    "district": R.district,
+    "city": R.city,
+    "zone": R.zone,
+    "typology": R.typology,
+    "typology_list": R.typology,
+}
+
+
+def archived_monthly(db: Session, filters: dict):
+    """
+    Per-month aggregates of compacted snapshots from snapshot_rollups. Averages
+    and the median are listings-weighted over segments (the median is therefore
+    an approximation). None when a filter needs a column the rollups don't keep.
+    """
+    shape = filter_shape(filters)
+    if any(key not in ROLLUP_FILTERS for key in shape):
+        return None
+    month = func.date_trunc("month", R.upload_date, type_=DateTime).label("month")
+    weight = func.sum(case((R.avg_price_per_m2.isnot(None), R.listings), else_=0))
+    stmt = (
+        select(
+            month,
+            func.sum(R.listings).label("listings"),
+            weight.label("n"),
+            (func.sum(R.avg_price_per_m2 * R.listings) / func.nullif(weight, 0)).label("avg_price"),
+            func.min(R.min_price_per_m2).label("min_price"),
+            func.max(R.max_price_per_m2).label("max_price"),
+            (func.sum(R.median_price_per_m2 * R.listings) / func.nullif(weight, 0)).label("median_price"),
+        )
+        .group_by(month)
+        .order_by(month)
+    )
+    for key in shape:
+        column = ROLLUP_FILTERS[key]
+        stmt = stmt.where(column.in_(filters[key]) if key == "typology_list" else column == filters[key])
+    return db.execute(stmt).all()
+
+
+def _weighted(parts, attr):
+    pairs = [(getattr(p, attr, None), getattr(p, "n", 0)) for p in parts]
+    pairs = [(v, n) for v, n in pairs if v is not None and n]
+    total = sum(n for _, n in pairs)
+    return sum(float(v) * n for v, n in pairs) / total if total else None
+
+
+def with_archived(db: Session, live, filters: dict, response: Response):
+    """
+    Live monthly rows plus archived_monthly(), one row per month. A month with
+    both live and archived snapshots gets counts summed, min / max combined and
+    the averages weighted by listings with a price per m2 (live rows carry n).
+    Rows built from archived data have archived=True (their median is approximate).
+    When the filters rule the rollups out and there are any, ARCHIVED_HEADER is
+    set to "excluded".
+    """
+    archived = archived_monthly(db, filters)
+    if archived is None:
+        if db.query(R.id).first() is not None:
+            response.headers[ARCHIVED_HEADER] = "excluded"
+        archived = []
+    by_month = {}
+    for r in live:
+        by_month.setdefault(r.month, []).append(r)
+    for r in archived:
+        by_month.setdefault(r.month, []).append(SimpleNamespace(**r._asdict(), archived=True))
+    out = []
+    for month in sorted(by_month):
+        parts = by_month[month]
+        if len(parts) == 1:
+            out.append(parts[0])
+            continue
+        mins = [p.min_price for p in parts if getattr(p, "min_price", None) is not None]
+        maxes = [p.max_price for p in parts if getattr(p, "max_price", None) is not None]
+        out.append(SimpleNamespace(
+            month=month,
+            listings=sum(getattr(p, "listings", 0) or 0 for p in parts),
+            n=sum(getattr(p, "n", 0) or 0 for p in parts),
+            avg_price=_weighted(parts, "avg_price"),
+            min_price=min(mins) if mins else None,
+            max_price=max(maxes) if maxes else None,
+            median_price=_weighted(parts, "median_price"),
+            archived=True,
+        ))
+    return out
+
 
 @router.get("/avg_price_per_m2", response_model=List[schemas.AvgPricePerM2Out])
 def avg_price_per_m2(
-    db: Session = Depends(database.get_db),
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     district: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
     zone: Optional[str] = Query(None),
@@ -27,17 +153,6 @@ def avg_price_per_m2(
     search_address: Optional[str] = Query(None),
     search_tags: Optional[str] = Query(None),
 ):
-    month_expr = func.date_trunc("month", models.Snapshot.upload_date).label("month")
-
-    query = (
-        db.query(
-            month_expr,
-            func.avg(models.PropertySnapshot.price_per_m2).label("avg_price"),
-        )
-        .join(models.PropertySnapshot.snapshot)
-        .join(models.PropertySnapshot.property)  # needed for area filter
-    )
-
     filters = {
         "district": district,
         "city": city,
@@ -54,8 +169,16 @@ def avg_price_per_m2(
         "search_tags": search_tags,
     }
 
-    query = apply_filters(query, filters)
-    results = query.group_by(month_expr).order_by(month_expr).all()
+    results = monthly_rows(
+        db,
+        "avg_price_per_m2",
+        lambda: [
+            func.avg(models.PropertySnapshot.price_per_m2).label("avg_price"),
+            func.count(models.PropertySnapshot.price_per_m2).label("n"),
+        ],
+        filters,
+    )
+    results = with_archived(db, results, filters, response)
 
     return [
         {"month": r.month.strftime("%Y-%m"), "avg_price": float(r.avg_price)}
@@ -66,7 +189,8 @@ def avg_price_per_m2(
 
 @router.get("/price_distribution", response_model=List[schemas.PriceDistributionOut])
 def price_distribution(
-    db: Session = Depends(database.get_db),
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     district: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
     zone: Optional[str] = Query(None),
@@ -81,19 +205,6 @@ def price_distribution(
     search_address: Optional[str] = Query(None),
     search_tags: Optional[str] = Query(None),
 ):
-    month_expr = func.date_trunc("month", models.Snapshot.upload_date).label("month")
-
-    query = (
-        db.query(
-            month_expr,
-            func.min(models.PropertySnapshot.price_per_m2).label("min_price"),
-            func.max(models.PropertySnapshot.price_per_m2).label("max_price"),
-            func.percentile_cont(0.5).within_group(models.PropertySnapshot.price_per_m2).label("median_price"),
-        )
-        .join(models.PropertySnapshot.snapshot)
-        .join(models.PropertySnapshot.property)
-    )
-
     filters = {
         "district": district,
         "city": city,
@@ -110,8 +221,18 @@ def price_distribution(
         "search_tags": search_tags,
     }
 
-    query = apply_filters(query, filters)
-    results = query.group_by(month_expr).order_by(month_expr).all()
+    results = monthly_rows(
+        db,
+        "price_distribution",
+        lambda: [
+            func.min(models.PropertySnapshot.price_per_m2).label("min_price"),
+            func.max(models.PropertySnapshot.price_per_m2).label("max_price"),
+            func.percentile_cont(0.5).within_group(models.PropertySnapshot.price_per_m2).label("median_price"),
+            func.count(models.PropertySnapshot.price_per_m2).label("n"),
+        ],
+        filters,
+    )
+    results = with_archived(db, results, filters, response)
 
     return [
         {
@@ -119,6 +240,7 @@ def price_distribution(
             "min_price": float(r.min_price) if r.min_price is not None else None,
             "max_price": float(r.max_price) if r.max_price is not None else None,
             "median_price": float(r.median_price) if r.median_price is not None else None,
+            "median_approx": getattr(r, "archived", False),
         }
         for r in results
     ]
@@ -126,7 +248,8 @@ def price_distribution(
 
 @router.get("/listings_per_month", response_model=List[schemas.ListingsPerMonthOut])
 def listings_per_month(
-    db: Session = Depends(database.get_db),
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     district: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
     zone: Optional[str] = Query(None),
@@ -141,16 +264,308 @@ def listings_per_month(
     search_address: Optional[str] = Query(None),
     search_tags: Optional[str] = Query(None),
 ):
-    month_expr = func.date_trunc("month", models.Snapshot.upload_date).label("month")
+    filters = {
+        "district": district,
+        "city": city,
+        "zone": zone,
+        "agency": agency,
+        "typology_list": typology,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_price_per_m2": min_price_per_m2,
+        "max_price_per_m2": max_price_per_m2,
+        "min_area": min_area,
+        "max_area": max_area,
+        "search_address": search_address,
+        "search_tags": search_tags,
+    }
+
+    results = monthly_rows(
+        db,
+        "listings_per_month",
+        lambda: [func.count(models.PropertySnapshot.id).label("listings")],
+        filters,
+    )
+    results = with_archived(db, results, filters, response)
+
+    return [{"month": r.month.strftime("%Y-%m"), "count": int(r.listings)} for r in results]
+
+
+# ---- Distributions ----
+DISTRIBUTION_METRICS = {
+    "price": models.PropertySnapshot.price,
+    "price_per_m2": models.PropertySnapshot.price_per_m2,
+    "area": models.Property.area,
+}
+DISTRIBUTION_GROUPS = ("month", "district", "city", "zone", "typology", "agency")
+DEFAULT_PERCENTILES = "5,10,25,50,75,90,95"
+MAX_BINS = 200
+
+
+def parse_percentiles(value: str):
+    try:
+        percentiles = sorted({float(v) for v in value.split(",") if v.strip()})
+    except ValueError:
+        percentiles = None
+    if not percentiles or not all(0 <= p <= 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="percentiles must be numbers between 0 and 100")
+    return percentiles
 
-    query = (
-        db.query(
-            month_expr,
-            func.count(models.PropertySnapshot.id).label("count"),
+
+def distribution_statement(metric: str, group_by: str, shape: tuple):
+    """
+    One statement per (metric, group_by, filter shape):
+      base     filtered (group, value) rows
+      bounds   histogram range: bin_min/bin_max, or the filtered min/max
+      stats    count/min/max/avg + percentile_cont(ARRAY[...]) per group
+      hist     width_bucket counts per group, folded into arrays
+    Only one row per group leaves the database.
+    """
+    def build():
+        PS = models.PropertySnapshot
+        x = DISTRIBUTION_METRICS[metric]
+        if group_by == "month":
+            group = func.to_char(func.date_trunc("month", models.Snapshot.upload_date), "YYYY-MM")
+        else:
+            group = getattr(PS, group_by)
+
+        base = (
+            select(group.label("grp"), x.label("x"))
+            .select_from(PS)
+            .join(PS.snapshot)
+            .join(PS.property)
+            .where(x.isnot(None), *filter_clauses(shape))
+            .cte("base")
+        )
+
+        lo = func.coalesce(bindparam("bin_min", type_=Float), func.min(base.c.x))
+        hi = func.coalesce(bindparam("bin_max", type_=Float), func.max(base.c.x))
+        # width_bucket() rejects lower = upper (a single distinct value)
+        bounds = select(lo.label("lo"), case((hi > lo, hi), else_=lo + 1).label("hi")).cte("bounds")
+
+        bins = bindparam("bins", type_=Integer)
+        bucket = case(
+            # the maximum belongs to the last bin, not to overflow
+            (base.c.x == bounds.c.hi, bins),
+            else_=func.width_bucket(base.c.x, bounds.c.lo, bounds.c.hi, bins),
+        )
+        bucketed = select(base.c.grp, bucket.label("bucket")).select_from(base.join(bounds, true())).subquery()
+        hist = (
+            select(bucketed.c.grp, bucketed.c.bucket, func.count().label("n"))
+            .group_by(bucketed.c.grp, bucketed.c.bucket)
+            .subquery()
         )
-        .join(models.PropertySnapshot.snapshot)
-        .join(models.PropertySnapshot.property)
+        hist_agg = (
+            select(
+                hist.c.grp,
+                func.array_agg(aggregate_order_by(hist.c.bucket, hist.c.bucket)).label("buckets"),
+                func.array_agg(aggregate_order_by(hist.c.n, hist.c.bucket)).label("counts"),
+            )
+            .group_by(hist.c.grp)
+            .cte("hist")
+        )
+
+        stats = (
+            select(
+                base.c.grp,
+                func.count(base.c.x).label("n"),
+                func.min(base.c.x).label("min"),
+                func.max(base.c.x).label("max"),
+                func.avg(base.c.x).label("mean"),
+                func.percentile_cont(bindparam("percentiles", type_=ARRAY(Float)))
+                .within_group(base.c.x)
+                .label("percentiles"),
+            )
+            .group_by(base.c.grp)
+            .cte("stats")
+        )
+
+        return (
+            select(stats, hist_agg.c.buckets, hist_agg.c.counts, bounds.c.lo, bounds.c.hi)
+            .select_from(
+                stats.outerjoin(hist_agg, stats.c.grp.is_not_distinct_from(hist_agg.c.grp))
+                .join(bounds, true())
+            )
+            .order_by(stats.c.grp.asc().nulls_last())
+        )
+
+    return _statements.get(("distribution", metric, group_by, shape), build)
+
+
+@router.get("/distribution", response_model=schemas.DistributionOut)
+def distribution(
+    db: Session = Depends(database.get_read_db),
+    metric: str = Query("price_per_m2"),
+    group_by: str = Query("month"),
+    # comma separated, 0-100
+    percentiles: str = Query(DEFAULT_PERCENTILES),
+    bins: int = Query(20, ge=1, le=MAX_BINS),
+    # fixed histogram range; defaults to the filtered min / max
+    bin_min: Optional[float] = Query(None),
+    bin_max: Optional[float] = Query(None),
+    district: Optional[str] = Query(None),
+    city: Optional[str] = Query(None),
+    zone: Optional[str] = Query(None),
+    agency: Optional[str] = Query(None),
+    typology: Optional[List[str]] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    min_price_per_m2: Optional[float] = Query(None),
+    max_price_per_m2: Optional[float] = Query(None),
+    min_area: Optional[float] = Query(None),
+    max_area: Optional[float] = Query(None),
+    search_address: Optional[str] = Query(None),
+    search_tags: Optional[str] = Query(None),
+):
+    """
+    Percentiles and a histogram of price, price_per_m2 or area per month or
+    per facet, without shipping raw rows. Needs raw rows, so snapshots
+    compacted by app.retention (rows only in Parquet) are not included.
+    """
+    if metric not in DISTRIBUTION_METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(DISTRIBUTION_METRICS)}")
+    if group_by not in DISTRIBUTION_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(DISTRIBUTION_GROUPS)}")
+    if bin_min is not None and bin_max is not None and bin_min >= bin_max:
+        raise HTTPException(status_code=400, detail="bin_min must be lower than bin_max")
+    pcts = parse_percentiles(percentiles)
+
+    filters = {
+        "district": district,
+        "city": city,
+        "zone": zone,
+        "agency": agency,
+        "typology_list": typology,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_price_per_m2": min_price_per_m2,
+        "max_price_per_m2": max_price_per_m2,
+        "min_area": min_area,
+        "max_area": max_area,
+        "search_address": search_address,
+        "search_tags": search_tags,
+    }
+    shape = filter_shape(filters)
+    params = filter_params(filters, shape)
+    params.update(
+        bins=bins,
+        bin_min=bin_min,
+        bin_max=bin_max,
+        percentiles=[p / 100 for p in pcts],
     )
+    rows = db.execute(distribution_statement(metric, group_by, shape), params).all()
+
+    out = schemas.DistributionOut(metric=metric, group_by=group_by)
+    if not rows:
+        return out
+    out.lower, out.upper = float(rows[0].lo), float(rows[0].hi)
+    out.bin_width = (out.upper - out.lower) / bins
+    for r in rows:
+        histogram = [0] * (bins + 2)
+        for b, n in zip(r.buckets or [], r.counts or []):
+            histogram[b] = n
+        out.groups.append(schemas.DistributionGroupOut(
+            group=r.grp,
+            count=r.n,
+            min=r.min,
+            max=r.max,
+            mean=float(r.mean) if r.mean is not None else None,
+            percentiles={f"p{p:g}": v for p, v in zip(pcts, r.percentiles or [])},
+            histogram=histogram[1:-1],
+            underflow=histogram[0],
+            overflow=histogram[-1],
+        ))
+    return out
+
+
+# ---- Cross-tabs ----
+CROSSTAB_DIMENSIONS = ("district", "city", "zone", "typology", "agency")
+CROSSTAB_METRICS = ("count", "mean_ppm2", "median_ppm2", "mean_area")
+MAX_CROSSTAB_CELLS = 50000
+
+
+def crosstab_metric(metric: str):
+    PS = models.PropertySnapshot
+    if metric == "count":
+        return func.count(PS.id)
+    if metric == "mean_ppm2":
+        return func.avg(PS.price_per_m2)
+    if metric == "median_ppm2":
+        return func.percentile_cont(0.5).within_group(PS.price_per_m2)
+    return func.avg(models.Property.area)
+
+
+def crosstab_statement(dims: tuple, metric: str, scoped: bool, shape: tuple):
+    """One grouped statement per (dims, metric, scoped, filter shape); only non-empty cells come back."""
+    def build():
+        PS = models.PropertySnapshot
+        cols = [getattr(PS, d) for d in dims]
+        scope = [PS.snapshot_id == bindparam("snapshot_id")] if scoped else []
+        return (
+            select(*cols, crosstab_metric(metric).label("value"), func.count(PS.id).label("n"))
+            .select_from(PS)
+            .join(PS.property)  # area metric / filter
+            .where(*scope, *filter_clauses(shape))
+            .group_by(*cols)
+            # when capped, keep the densest cells, the same ones on every run
+            .order_by(func.count(PS.id).desc(), *cols)
+            .limit(bindparam("max_cells"))
+        )
+
+    return _statements.get(("crosstab", dims, metric, scoped, shape), build)
+
+
+def resolve_snapshot_scope(db: Session, snapshot: str):
+    """"latest" -> newest snapshot id, "all" -> None (whole history), "<id>" -> id."""
+    if snapshot == "all":
+        return None
+    if snapshot == "latest":
+        current = db.query(func.max(models.Snapshot.id)).scalar()
+        if current is None:
+            raise HTTPException(status_code=404, detail="No snapshots yet")
+        return current
+    try:
+        return int(snapshot)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="snapshot must be 'latest', 'all' or a snapshot id")
+
+
+@router.get("/crosstab", response_model=schemas.CrosstabOut)
+def crosstab(
+    db: Session = Depends(database.get_read_db),
+    # comma separated, 2 or 3 of CROSSTAB_DIMENSIONS, e.g. zone,typology
+    dims: str = Query(...),
+    metric: str = Query("count"),
+    snapshot: str = Query("latest"),
+    district: Optional[str] = Query(None),
+    city: Optional[str] = Query(None),
+    zone: Optional[str] = Query(None),
+    agency: Optional[str] = Query(None),
+    typology: Optional[List[str]] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    min_price_per_m2: Optional[float] = Query(None),
+    max_price_per_m2: Optional[float] = Query(None),
+    min_area: Optional[float] = Query(None),
+    max_area: Optional[float] = Query(None),
+    search_address: Optional[str] = Query(None),
+    search_tags: Optional[str] = Query(None),
+):
+    """
+    A whole dims matrix from one grouped query. Sparse: axes list each
+    dimension's values once and every non-empty cell is
+    [axis index..., value, listings]. snapshot=all covers the snapshots still
+    in the database; ones compacted by app.retention are not included.
+    """
+    dim_list = tuple(d.strip() for d in dims.split(",") if d.strip())
+    if not 2 <= len(dim_list) <= 3 or len(set(dim_list)) != len(dim_list):
+        raise HTTPException(status_code=400, detail="dims must be 2 or 3 distinct dimensions")
+    unknown = [d for d in dim_list if d not in CROSSTAB_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"dims must be among {', '.join(CROSSTAB_DIMENSIONS)}")
+    if metric not in CROSSTAB_METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(CROSSTAB_METRICS)}")
+    snapshot_id = resolve_snapshot_scope(db, snapshot)
 
     filters = {
         "district": district,
@@ -167,8 +582,35 @@ def listings_per_month(
         "search_address": search_address,
         "search_tags": search_tags,
     }
+    shape = filter_shape(filters)
+    params = filter_params(filters, shape)
+    params.update(max_cells=MAX_CROSSTAB_CELLS + 1)
+    if snapshot_id is not None:
+        params.update(snapshot_id=snapshot_id)
+    rows = db.execute(crosstab_statement(dim_list, metric, snapshot_id is not None, shape), params).all()
+    truncated = len(rows) > MAX_CROSSTAB_CELLS
+    rows = rows[:MAX_CROSSTAB_CELLS]
 
-    query = apply_filters(query, filters)
-    results = query.group_by(month_expr).order_by(month_expr).all()
+    k = len(dim_list)
+    # None (e.g. listings without a zone) sorts last
+    axes = [
+        sorted({r[i] for r in rows}, key=lambda v: (v is None, v or ""))
+        for i in range(k)
+    ]
+    positions = [{v: n for n, v in enumerate(axis)} for axis in axes]
+    def value(v):
+        if v is None or metric == "count":
+            return v
+        return round(float(v), 2)
 
-    return [{"month": r.month.strftime("%Y-%m"), "listings": int(r.count)} for r in results]
+    cells = [[*(positions[i][r[i]] for i in range(k)), value(r.value), r.n] for r in rows]
+    cells.sort()
+    # already plain JSON types: skip response-model validation of every cell
+    return JSONResponse({
+        "dims": list(dim_list),
+        "metric": metric,
+        "snapshot_id": snapshot_id,
+        "axes": axes,
+        "cells": cells,
+        "truncated": truncated,
+    })
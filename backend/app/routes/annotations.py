@@ -1,10 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert
+from typing import List
 
 from .. import models, schemas, database
 
 router = APIRouter()
 
+ANNOTATION_FIELDS = ("reviewed", "contacted", "notes", "interesting")
+# columns a brand-new row gets when a field was not sent
+ANNOTATION_DEFAULTS = {"reviewed": False, "contacted": False, "notes": None, "interesting": None}
+INTERESTING_VALUES = (None, "Yes", "No")
+MAX_BULK_ANNOTATIONS = 1000
+
+
+def upsert_annotations(db: Session, items):
+    """
+    Upserts one annotation per property; fields left as None keep their stored
+    value. Items are grouped by which fields they set, so a typical triage batch
+    ("mark these 200 as reviewed") is a single INSERT ... ON CONFLICT DO UPDATE.
+    Returns {property_id: (row, created)} and leaves committing to the caller.
+    """
+    # the same property twice in one statement is an error for ON CONFLICT: merge
+    merged = {}
+    for item in items:
+        fields = {f: getattr(item, f) for f in ANNOTATION_FIELDS if getattr(item, f) is not None}
+        merged.setdefault(item.property_id, {}).update(fields)
+
+    by_mask = {}
+    for property_id, fields in merged.items():
+        by_mask.setdefault(tuple(sorted(fields)), []).append(property_id)
+
+    table = models.Annotation.__table__
+    results = {}
+    for mask, property_ids in by_mask.items():
+        rows = [
+            {"property_id": pid, **ANNOTATION_DEFAULTS, **merged[pid]}
+            for pid in property_ids
+        ]
+        stmt = insert(table).values(rows)
+        if mask:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.property_id],
+                set_={f: stmt.excluded[f] for f in mask},
+            )
+        else:
+            # nothing to change, but still return the existing row
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.property_id],
+                set_={"property_id": stmt.excluded.property_id},
+            )
+        # xmax = 0 only for rows this statement inserted
+        stmt = stmt.returning(*table.c, literal_column("xmax = 0").label("created"))
+        for r in db.execute(stmt):
+            results[r.property_id] = (r, r.created)
+    return results
+
+
+def validate_interesting(value):
+    if value not in INTERESTING_VALUES:
+        raise HTTPException(status_code=400, detail="interesting must be 'Yes' or 'No'")
+
+
+@router.get("/", response_model=list[schemas.AnnotationOut])
+def list_annotations_batch(
+    property_id: List[int] = Query(...),
+    db: Session = Depends(database.get_db),
+):
+    """Annotations of many properties: /annotations/?property_id=1&property_id=2"""
+    if len(property_id) > MAX_BULK_ANNOTATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_ANNOTATIONS} property ids per request",
+        )
+    return (
+        db.query(models.Annotation)
+        .filter(models.Annotation.property_id.in_(set(property_id)))
+        .all()
+    )
+
+
+@router.post("/bulk", response_model=list[schemas.AnnotationBulkResultOut])
+def bulk_upsert_annotations(
+    payload: schemas.AnnotationBulkIn,
+    db: Session = Depends(database.get_db),
+):
+    """All-or-nothing: any invalid item or unknown property rejects the whole batch."""
+    if len(payload.items) > MAX_BULK_ANNOTATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_ANNOTATIONS} annotations per request",
+        )
+    for n, item in enumerate(payload.items):
+        if item.interesting not in INTERESTING_VALUES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"items[{n}]: interesting must be 'Yes' or 'No'",
+            )
+
+    ids = {item.property_id for item in payload.items}
+    known = {
+        pid for (pid,) in db.query(models.Property.id).filter(models.Property.id.in_(ids)).all()
+    }
+    missing = sorted(ids - known)
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Property not found: {', '.join(map(str, missing))}",
+        )
+
+    results = upsert_annotations(db, payload.items)
+    db.commit()
+
+    out = []
+    # one result per property, in request order
+    for pid in dict.fromkeys(item.property_id for item in payload.items):
+        row, created = results[pid]
+        out.append(schemas.AnnotationBulkResultOut(
+            property_id=pid,
+            status="created" if created else "updated",
+            annotation=schemas.AnnotationOut.model_validate(row),
+        ))
+    return out
+
 
 @router.get("/{property_id}", response_model=list[schemas.AnnotationOut])
 def list_annotations(property_id: int, db: Session = Depends(database.get_db)):
@@ -21,41 +140,18 @@ def create_or_update_annotation(
     payload: schemas.AnnotationCreate,
     db: Session = Depends(database.get_db),
 ):
+    # Only allow "Yes" or "No" (or None); the property card sends "" when nothing was picked
+    if payload.interesting == "":
+        payload.interesting = None
+    validate_interesting(payload.interesting)
+
     # Ensure property exists
-    prop = db.query(models.Property).filter(models.Property.id == property_id).first()
+    prop = db.query(models.Property.id).filter(models.Property.id == property_id).first()
     if not prop:
         raise HTTPException(status_code=404, detail="Property not found")
 
     # Upsert single annotation row per property (keeps UI simple)
-    ann = (
-        db.query(models.Annotation)
-        .filter(models.Annotation.property_id == property_id)
-        .first()
-    )
-    if ann:
-        # Update existing
-        if payload.reviewed is not None:
-            ann.reviewed = payload.reviewed
-        if payload.contacted is not None:
-            ann.contacted = payload.contacted
-        if payload.notes is not None:
-            ann.notes = payload.notes
-        if payload.interesting is not None:
-            # Only allow "Yes" or "No" (or None)
-            if payload.interesting not in (None, "Yes", "No"):
-                raise HTTPException(status_code=400, detail="interesting must be 'Yes' or 'No'")
-            ann.interesting = payload.interesting
-    else:
-        # Create new
-        ann = models.Annotation(
-            property_id=property_id,
-            reviewed=payload.reviewed or False,
-            contacted=payload.contacted or False,
-            notes=payload.notes,
-            interesting=payload.interesting if payload.interesting in (None, "Yes", "No") else None,
-        )
-        db.add(ann)
-
+    item = schemas.AnnotationBulkItem(**payload.model_dump(exclude={"property_id"}), property_id=property_id)
+    row, _ = upsert_annotations(db, [item])[property_id]
     db.commit()
-    db.refresh(ann)
-    return ann
+    return row
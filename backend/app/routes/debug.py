@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from typing import List
+
+from .. import bootstrap, database, filters, index_advisor, profiling, schemas, slow_queries
+
+router = APIRouter()
+
+
+@router.get("/slow_queries", response_model=List[schemas.SlowQueryOut])
+def list_slow_queries(fingerprint: str = None):
+    """Captured slow statements, newest first (optionally for one fingerprint)."""
+    out = slow_queries.captures()
+    if fingerprint:
+        out = [c for c in out if c["fingerprint"] == fingerprint]
+    return out
+
+
+@router.delete("/slow_queries")
+def clear_slow_queries():
+    slow_queries.clear()
+    return {"status": "ok"}
+
+
+@router.get("/startup")
+def startup_timings():
+    """Seconds spent per startup phase in this worker."""
+    return bootstrap.timings
+
+
+@router.get("/index_advice")
+def index_advice(db: Session = Depends(database.get_db)):
+    """Index proposals for the filter shapes this worker has run (app.index_advisor)."""
+    return index_advisor.advise(db)
+
+
+@router.delete("/index_advice")
+def clear_index_advice():
+    filters.workload.clear()
+    return {"status": "ok"}
+
+
+@router.get("/profiles", response_model=List[schemas.ProfileOut])
+def list_profiles():
+    """Recently profiled requests, newest first (see app.profiling)."""
+    return profiling.store.summaries()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("speedscope")):
+    if format not in profiling.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(profiling.FORMATS)}")
+    profile = profiling.store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (expired or never recorded)")
+    if format == "collapsed":
+        return PlainTextResponse(profiling.collapsed(profile))
+    return profiling.speedscope(profile)
+
+
+@router.delete("/profiles")
+def clear_profiles():
+    profiling.store.clear()
+    return {"status": "ok"}
@@ -0,0 +1,46 @@
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from .. import database, events
+
+router = APIRouter()
+
+
+def _generation():
+    # the primary: a lagging replica would announce an old generation
+    db = database.SessionLocal()
+    try:
+        return events.current_generation(db)
+    finally:
+        db.close()
+
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """Server-sent events, see app.events."""
+    entry = events.subscribe()
+    _, queue = entry
+    generation = await run_in_threadpool(_generation)
+
+    async def stream():
+        try:
+            yield events.format_sse({"event": "generation", "generation": generation})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=events.HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield events.format_sse(event)
+        finally:
+            events.unsubscribe(entry)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # no caching, and no buffering in a reverse proxy (nginx)
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def prometheus_metrics():
+    # Prometheus text exposition format 0.0.4
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,77 +1,133 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy import bindparam, func, select
 from typing import Optional, List
 
-from .. import models, schemas, database
+from .. import columnar, comps, models, schemas, database, suggest
+from ..filters import (  # noqa: F401 (apply_filters re-exported)
+    INTERESTING_UNSET,
+    apply_filters,
+    filter_clauses,
+    filter_params,
+    filter_shape,
+    uses_annotations,
+    workload,
+)
+from ..statements import StatementCache, in_ids
 
 router = APIRouter()
 
 
-def apply_filters(query, filters: dict):
+# ---- Sparse fieldsets ----
+PROPERTY_FIELDS = ("id", "property_id", "title", "url", "area", "typology", "created_at")
+SNAPSHOT_FIELDS = (
+    "id", "property_id", "snapshot_id",
+    "price", "price_per_m2", "status", "deal_score", "deal_percentile", "raw_json",
+    "district", "city", "zone", "typology", "agency", "address", "tags",
+    "parking", "elevator", "new_construction", "rented", "trespasse",
+    "image_url", "video_url",
+)
+# Keys needed to stitch snapshots back to their property; always loaded
+SNAPSHOT_KEYS = ("id", "property_id", "snapshot_id")
+# Heavy / rarely rendered columns: only loaded when named in fields=
+DEFERRED_SNAPSHOT_FIELDS = ("raw_json", "video_url")
+# snapshots = full history, latest = only the most recent snapshot row
+INCLUDES = ("snapshots", "latest", "annotations")
+# sort= values; sorted listings are ranked on the current (latest) snapshot only
+SORTS = ("deal_score",)
+MAX_SORT_LIMIT = 1000
+
+_listing_statements = StatementCache("properties.list")
+# upper bounds for the batched history / comps endpoints
+MAX_HISTORY_IDS = 500
+MAX_COMPS_IDS = 200
+MAX_COMPS_K = 100
+
+
+def parse_csv_param(value: Optional[str], allowed, name: str):
+    if value is None:
+        return None
+    items = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in items if v not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {name}: {', '.join(unknown)}")
+    return items
+
+
+def resolve_projection(fields: Optional[str], include: Optional[str]):
     """
-    Reusable filters for both property listing and analytics queries.
-    Works with a query that already involves PropertySnapshot (and Property for area).
+    Turns the fields= / include= params into the columns to load.
+    Without fields= everything except DEFERRED_SNAPSHOT_FIELDS is returned.
     """
+    requested = parse_csv_param(fields, set(PROPERTY_FIELDS) | set(SNAPSHOT_FIELDS), "fields")
+    includes = parse_csv_param(include, INCLUDES, "include")
+    if includes is None:
+        includes = list(INCLUDES)
+
+    if requested is None:
+        prop_cols = list(PROPERTY_FIELDS)
+        snap_cols = [c for c in SNAPSHOT_FIELDS if c not in DEFERRED_SNAPSHOT_FIELDS]
+    else:
+        prop_cols = ["id"] + [c for c in PROPERTY_FIELDS if c in requested and c != "id"]
+        snap_cols = list(SNAPSHOT_KEYS) + [
+            c for c in SNAPSHOT_FIELDS if c in requested and c not in SNAPSHOT_KEYS
+        ]
+    return prop_cols, snap_cols, includes
 
-    # Categorical equals
-    if filters.get("district"):
-        query = query.filter(models.PropertySnapshot.district == filters["district"])
-    if filters.get("city"):
-        query = query.filter(models.PropertySnapshot.city == filters["city"])
-    if filters.get("zone"):
-        query = query.filter(models.PropertySnapshot.zone == filters["zone"])
-    if filters.get("agency"):
-        query = query.filter(models.PropertySnapshot.agency == filters["agency"])
-
-    # Typology can be list (e.g., ["T2","T3","T4"])
-    typs = filters.get("typology_list")
-    if typs:
-        query = query.filter(models.PropertySnapshot.typology.in_(typs))
-    elif filters.get("typology"):
-        query = query.filter(models.PropertySnapshot.typology == filters["typology"])
-
-    # Boolean flags
-    if filters.get("parking") is not None:
-        query = query.filter(models.PropertySnapshot.parking == filters["parking"])
-    if filters.get("elevator") is not None:
-        query = query.filter(models.PropertySnapshot.elevator == filters["elevator"])
-    if filters.get("new_construction") is not None:
-        query = query.filter(models.PropertySnapshot.new_construction == filters["new_construction"])
-    if filters.get("rented") is not None:
-        query = query.filter(models.PropertySnapshot.rented == filters["rented"])
-    if filters.get("trespasse") is not None:
-        query = query.filter(models.PropertySnapshot.trespasse == filters["trespasse"])
-
-    # Text search (ILIKE)
-    if filters.get("search_address"):
-        query = query.filter(models.PropertySnapshot.address.ilike(f"%{filters['search_address']}%"))
-    if filters.get("search_tags"):
-        query = query.filter(models.PropertySnapshot.tags.ilike(f"%{filters['search_tags']}%"))
-
-    # Numeric ranges
-    if filters.get("min_price") is not None:
-        query = query.filter(models.PropertySnapshot.price >= filters["min_price"])
-    if filters.get("max_price") is not None:
-        query = query.filter(models.PropertySnapshot.price <= filters["max_price"])
-
-    if filters.get("min_price_per_m2") is not None:
-        query = query.filter(models.PropertySnapshot.price_per_m2 >= filters["min_price_per_m2"])
-    if filters.get("max_price_per_m2") is not None:
-        query = query.filter(models.PropertySnapshot.price_per_m2 <= filters["max_price_per_m2"])
-
-    # area is on Property (not on PropertySnapshot)
-    if filters.get("min_area") is not None:
-        query = query.filter(models.Property.area >= filters["min_area"])
-    if filters.get("max_area") is not None:
-        query = query.filter(models.Property.area <= filters["max_area"])
-
-    return query
-
-
-@router.get("/", response_model=List[schemas.PropertyFullOut])
+
+def projection_options(prop_cols, snap_cols, includes):
+    opts = [load_only(*[getattr(models.Property, c) for c in prop_cols])]
+    if "snapshots" in includes:
+        opts.append(
+            joinedload(models.Property.snapshots).load_only(
+                *[getattr(models.PropertySnapshot, c) for c in snap_cols]
+            )
+        )
+    if "annotations" in includes:
+        opts.append(joinedload(models.Property.annotations))
+    return opts
+
+
+def load_latest_snapshots(db: Session, property_ids, snap_cols):
+    """Most recent PropertySnapshot per property, in one query."""
+    if not property_ids:
+        return {}
+    PS = models.PropertySnapshot
+    # an unfiltered listing passes every property: one array parameter, not one per id
+    latest_ids = (
+        select(func.max(PS.id))
+        .where(in_ids(PS.property_id, "property_ids", db.get_bind().dialect.name))
+        .group_by(PS.property_id)
+    )
+    rows = db.execute(
+        select(PS)
+        .options(load_only(*[getattr(PS, c) for c in snap_cols]))
+        .where(PS.id.in_(latest_ids)),
+        {"property_ids": list(property_ids)},
+    ).scalars().all()
+    return {r.property_id: r for r in rows}
+
+
+def serialize_property(prop, prop_cols, snap_cols, includes, latest=None):
+    # only touch loaded attributes, otherwise deferred columns lazy-load per row
+    out = {c: getattr(prop, c) for c in prop_cols}
+    if "snapshots" in includes:
+        out["snapshots"] = [{c: getattr(s, c) for c in snap_cols} for s in prop.snapshots]
+    elif "latest" in includes:
+        snap = (latest or {}).get(prop.id)
+        out["snapshots"] = [{c: getattr(snap, c) for c in snap_cols}] if snap else []
+    if "annotations" in includes:
+        out["annotations"] = prop.annotations
+    return out
+
+
+@router.get(
+    "/",
+    response_model=List[schemas.PropertySparseOut],
+    response_model_exclude_unset=True,
+)
 def list_properties(
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     # categoricals
     district: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
@@ -95,15 +151,25 @@ def list_properties(
     # search
     search_address: Optional[str] = Query(None),
     search_tags: Optional[str] = Query(None),
+    # annotations: reviewed=false is the "still to triage" queue
+    reviewed: Optional[bool] = Query(None),
+    contacted: Optional[bool] = Query(None),
+    interesting: Optional[str] = Query(None),
+    has_notes: Optional[bool] = Query(None),
+    search_notes: Optional[str] = Query(None),
+    # ranking: sort=deal_score&min_deal_score=1.5&limit=50
+    min_deal_score: Optional[float] = Query(None),
+    sort: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=MAX_SORT_LIMIT),
+    # projection: comma separated, e.g. fields=title,price,image_url&include=snapshots
+    fields: Optional[str] = Query(None),
+    include: Optional[str] = Query(None),
 ):
-    query = (
-        db.query(models.Property)
-        .join(models.Property.snapshots)   # ensure PropertySnapshot is in the query
-        .options(
-            joinedload(models.Property.snapshots),
-            joinedload(models.Property.annotations),
-        )
-    )
+    prop_cols, snap_cols, includes = resolve_projection(fields, include)
+    if sort is not None and sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort}")
+    if interesting not in (None, "Yes", "No", INTERESTING_UNSET):
+        raise HTTPException(status_code=400, detail=f"interesting must be 'Yes', 'No' or '{INTERESTING_UNSET}'")
 
     filters = {
         "district": district,
@@ -124,15 +190,141 @@ def list_properties(
         "max_area": max_area,
         "search_address": search_address,
         "search_tags": search_tags,
+        "min_deal_score": min_deal_score,
+        "reviewed": reviewed,
+        "contacted": contacted,
+        "interesting": interesting,
+        "has_notes": has_notes,
+        "search_notes": search_notes,
     }
 
-    query = apply_filters(query, filters)
-    return query.all()
+    # annotations change constantly and are not in the columnar store
+    in_memory = sort is None and not uses_annotations(filter_shape(filters))
+    store = columnar.get_store(db) if in_memory else None
+    ranked = None
+    if sort == "deal_score":
+        ranked = rank_by_deal_score(db, filters, limit)
+        if not ranked:
+            return []
+        shape = ("ids",)
+        params = {"ids": ranked}
+    elif store is not None:
+        # filters evaluated in memory; the DB only does a primary-key fetch.
+        # Still counted for the index advisor: the shape is the same without the store
+        workload.record(filter_shape(filters))
+        ids = store.matching_property_ids(filters)
+        if not len(ids):
+            return []
+        shape = ("ids",)
+        params = {"ids": ids.tolist()}
+    else:
+        shape = filter_shape(filters)
+        params = filter_params(filters, shape)
+    key = (shape, tuple(prop_cols), tuple(snap_cols), tuple(includes))
+
+    def build():
+        stmt = select(models.Property).options(*projection_options(prop_cols, snap_cols, includes))
+        if shape == ("ids",):
+            # an unfiltered listing matches every property: one array parameter
+            return stmt.where(in_ids(models.Property.id, "ids", db.get_bind().dialect.name))
+        return (
+            stmt.join(models.Property.snapshots)   # ensure PropertySnapshot is in the query
+            .where(*filter_clauses(shape))
+        )
+
+    stmt = _listing_statements.get(key, build)
+    props = db.execute(stmt, params).unique().scalars().all()
+    if ranked is not None:
+        order = {pid: n for n, pid in enumerate(ranked)}
+        props.sort(key=lambda p: order[p.id])
+
+    latest = None
+    if "latest" in includes and "snapshots" not in includes:
+        latest = load_latest_snapshots(db, [p.id for p in props], snap_cols)
+
+    return [serialize_property(p, prop_cols, snap_cols, includes, latest) for p in props]
+
+
+def rank_by_deal_score(db: Session, filters: dict, limit: int):
+    """
+    Property ids of the current snapshot's best deals, best first. A top-N scan
+    of ix_property_snapshots_snapshot_id_deal_score.
+    """
+    current = db.query(func.max(models.Snapshot.id)).scalar()
+    if current is None:
+        return []
+    shape = filter_shape(filters)
+
+    def build():
+        PS = models.PropertySnapshot
+        return (
+            select(PS.property_id)
+            .join(PS.property)   # needed for area filter
+            .where(
+                PS.snapshot_id == bindparam("current_snapshot"),
+                PS.deal_score.isnot(None),
+                *filter_clauses(shape),
+            )
+            .order_by(PS.deal_score.desc())
+            .limit(bindparam("limit"))
+        )
+
+    stmt = _listing_statements.get(("deal_score", shape), build)
+    params = filter_params(filters, shape)
+    params.update(current_snapshot=current, limit=limit)
+    # a property listed twice in one snapshot only counts once
+    return list(dict.fromkeys(db.execute(stmt, params).scalars()))
+
+
+def load_histories(db: Session, property_ids: List[int]):
+    """
+    Price history for many properties in one round trip, as parallel arrays.
+    Served by ix_property_snapshots_property_id_snapshot_id.
+    """
+    out = {pid: schemas.PropertyHistoryOut(property_id=pid) for pid in property_ids}
+    if not out:
+        return out
+
+    rows = (
+        db.query(
+            models.PropertySnapshot.property_id,
+            models.Snapshot.upload_date,
+            models.PropertySnapshot.price,
+            models.PropertySnapshot.price_per_m2,
+            models.PropertySnapshot.status,
+        )
+        .join(models.PropertySnapshot.snapshot)
+        .filter(models.PropertySnapshot.property_id.in_(list(out)))
+        .order_by(models.PropertySnapshot.property_id, models.PropertySnapshot.snapshot_id)
+        .all()
+    )
+    for r in rows:
+        h = out[r.property_id]
+        h.dates.append(r.upload_date)
+        h.price.append(r.price)
+        h.price_per_m2.append(r.price_per_m2)
+        h.status.append(r.status)
+    return out
+
+
+def sort_typologies(raw_typs):
+    """T* sorted numerically first, then the others alphabetically."""
+    t_like = [t for t in raw_typs if t and t.upper().startswith("T")]
+    not_t = [t for t in raw_typs if not (t and t.upper().startswith("T"))]
+
+    def t_key(t):
+        # Extract the number after T; fallback large to push unknown last
+        try:
+            return int("".join(ch for ch in t.upper()[1:] if ch.isdigit()))
+        except Exception:
+            return 999
+
+    return sorted(t_like, key=t_key) + sorted(not_t)
 
 
 @router.get("/options", response_model=schemas.PropertiesOptionsOut)
 def options(
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     district: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
 ):
@@ -144,6 +336,16 @@ def options(
     - typologies (T* sorted numerically first)
     - agencies
     """
+    store = columnar.get_store(db)
+    if store is not None:
+        return schemas.PropertiesOptionsOut(
+            districts=store.distinct("district"),
+            cities=store.distinct("city", {"district": district}),
+            zones=store.distinct("zone", {"district": district, "city": city}),
+            typologies=sort_typologies(store.distinct("typology")),
+            agencies=store.distinct("agency"),
+        )
+
     base = db.query(models.PropertySnapshot)
 
     # districts (full)
@@ -192,17 +394,7 @@ def options(
         .all()
     )
     raw_typs = [t[0] for t in raw_typs]
-    t_like = [t for t in raw_typs if t and t.upper().startswith("T")]
-    not_t = [t for t in raw_typs if not (t and t.upper().startswith("T"))]
-
-    def t_key(t):
-        # Extract the number after T; fallback large to push unknown last
-        try:
-            return int("".join(ch for ch in t.upper()[1:] if ch.isdigit()))
-        except Exception:
-            return 999
-
-    typologies = sorted(t_like, key=t_key) + sorted(not_t)
+    typologies = sort_typologies(raw_typs)
 
     # agencies
     agencies = (
@@ -221,3 +413,73 @@ def options(
         typologies=typologies,
         agencies=agencies,
     )
+
+
+@router.get("/suggest", response_model=List[schemas.SuggestionOut])
+def suggest_values(
+    field: str = Query(...),
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=suggest.MAX_LIMIT),
+    db: Session = Depends(database.get_read_db),
+):
+    """Typeahead: values of `field` with a word starting with `q`, most listings first."""
+    if field not in suggest.FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"field must be one of: {', '.join(suggest.FIELDS)}",
+        )
+    return suggest.get_index(db).complete(field, q, limit)
+
+
+@router.post("/history", response_model=List[schemas.PropertyHistoryOut])
+def property_histories(
+    payload: schemas.PropertyHistoryBatchIn,
+    db: Session = Depends(database.get_db),
+):
+    # keep request order, drop duplicates
+    ids = list(dict.fromkeys(payload.property_ids))
+    if len(ids) > MAX_HISTORY_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_HISTORY_IDS} property ids per request",
+        )
+    return list(load_histories(db, ids).values())
+
+
+@router.get("/{property_id}/history", response_model=schemas.PropertyHistoryOut)
+def property_history(property_id: int, db: Session = Depends(database.get_db)):
+    history = load_histories(db, [property_id])[property_id]
+    if not history.dates:
+        exists = db.query(models.Property.id).filter(models.Property.id == property_id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Property not found")
+    return history
+
+
+@router.post("/comps", response_model=List[schemas.PropertyCompsOut])
+def property_comps_batch(
+    payload: schemas.PropertyCompsBatchIn,
+    db: Session = Depends(database.get_db),
+):
+    ids = list(dict.fromkeys(payload.property_ids))
+    if len(ids) > MAX_COMPS_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_COMPS_IDS} property ids per request",
+        )
+    if not 1 <= payload.k <= MAX_COMPS_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_COMPS_K}")
+    # ids without listings are skipped rather than failing the whole batch
+    return [r for r in comps.get_index(db).query(ids, payload.k).values() if r is not None]
+
+
+@router.get("/{property_id}/comps", response_model=schemas.PropertyCompsOut)
+def property_comps(
+    property_id: int,
+    k: int = Query(20, ge=1, le=MAX_COMPS_K),
+    db: Session = Depends(database.get_db),
+):
+    result = comps.get_index(db).query([property_id], k)[property_id]
+    if result is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return result
@@ -1,157 +1,146 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import datetime
-import io
-import pandas as pd
+from sqlalchemy import func
+from typing import List
 
-from .. import models, database, schemas
+from .. import events, ingest, models, database, schemas, uploads
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[schemas.SnapshotWithCountOut])
-def list_snapshots(db: Session = Depends(database.get_db)):
+def list_snapshots(db: Session = Depends(database.get_read_db)):
+    # one grouped count instead of a COUNT(*) per snapshot
+    counts = dict(
+        db.query(models.PropertySnapshot.snapshot_id, func.count(models.PropertySnapshot.id))
+        .group_by(models.PropertySnapshot.snapshot_id)
+        .all()
+    )
     snaps = db.query(models.Snapshot).order_by(models.Snapshot.upload_date.desc()).all()
-    out = []
-    for s in snaps:
-        cnt = (
-            db.query(models.PropertySnapshot)
-            .filter(models.PropertySnapshot.snapshot_id == s.id)
-            .count()
+    return [
+        schemas.SnapshotWithCountOut(
+            id=s.id, upload_date=s.upload_date, properties_count=counts.get(s.id, 0)
         )
-        out.append(
-            schemas.SnapshotWithCountOut(
-                id=s.id, upload_date=s.upload_date, properties_count=cnt
-            )
-        )
-    return out
+        for s in snaps
+    ]
 
 
-@router.post("/upload", response_model=schemas.SnapshotOut)
-async def upload_snapshot(file: UploadFile = File(...), db: Session = Depends(database.get_db)):
-    if not file.filename.endswith((".xlsx", ".xls", ".csv")):
-        raise HTTPException(status_code=400, detail="Please upload an Excel or CSV file.")
+UPLOAD_EXTENSIONS = (".xlsx", ".xls", ".csv", ".zip")
 
-    content = await file.read()
-    try:
-        if file.filename.endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(content))
-        else:
-            df = pd.read_excel(io.BytesIO(content))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read file: {e}")
-
-    # Column map based on your sheet names
-    map_cols = {
-        "date_scraped": "date_scraped",
-        "Distrito": "district",
-        "Concelho": "city",
-        "Zone": "zone",
-        "id": "ext_id",
-        "href": "url",
-        "title": "title",
-        "price": "price",
-        "price_per_m2": "price_per_m2",
-        "area": "area",
-        "typology": "typology",
-        "floor_info": "floor_info",
-        "land_status": "land_status",
-        "pricedown_price": "pricedown_price",
-        "agency": "agency",
-        "parking": "parking",
-        "address": "address",
-        "description": "description",
-        "trespasse": "trespasse",
-        "tag": "tags",
-        "arrendada": "rented",
-        "elevador": "elevator",
-        "nova_construcao": "new_construction",
-        "image_url": "image_url",
-        "video_url": "video_url",
-        # "Tipo","Sub-tipo","Sub Tipo" -> ignore for now
-    }
-
-    for src, _ in map_cols.items():
-        if src not in df.columns:
-            # allow missing optional columns silently, but key ones should exist
-            pass
-
-    # Create snapshot
-    snapshot = models.Snapshot(upload_date=datetime.utcnow())
-    db.add(snapshot)
-    db.commit()
-    db.refresh(snapshot)
-
-    # Normalize booleans
-    def to_bool(v):
-        if pd.isna(v):
-            return None
-        s = str(v).strip().lower()
-        return s in ["1", "true", "yes", "y", "sim"]
-
-    for _, row in df.iterrows():
-        # upsert Property by external id (Excel column 'id')
-        ext_id = str(row.get("id", "")).strip()
-        if not ext_id:
-            # skip rows without id
-            continue
-
-        prop = (
-            db.query(models.Property)
-            .filter(models.Property.property_id == ext_id)
-            .first()
+
+def check_filename(filename: str):
+    if not filename.endswith(UPLOAD_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Please upload Excel, CSV or zip files.")
+
+
+def ensure_not_ingested(db: Session, content_hash: str):
+    """Refuses files whose exact bytes were already ingested, before any parsing."""
+    existing = (
+        db.query(models.Snapshot.id)
+        .filter(models.Snapshot.content_hash == content_hash)
+        .first()
+    )
+    if existing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"This file was already ingested as snapshot {existing.id}",
         )
-        if not prop:
-            prop = models.Property(
-                property_id=ext_id,
-                title=row.get("title"),
-                url=row.get("href"),
-                area=(float(row["area"]) if not pd.isna(row.get("area")) else None),
-                typology=row.get("typology"),
-            )
-            db.add(prop)
-            db.commit()
-            db.refresh(prop)
-        else:
-            # keep latest meta up-to-date too
-            prop.title = row.get("title") or prop.title
-            prop.url = row.get("href") or prop.url
-            if not pd.isna(row.get("area")):
-                try:
-                    prop.area = float(row.get("area"))
-                except Exception:
-                    pass
-            prop.typology = row.get("typology") or prop.typology
-            db.add(prop)
-            db.commit()
-
-        ps = models.PropertySnapshot(
-            snapshot_id=snapshot.id,
-            property_id=prop.id,
-            price=(float(row["price"]) if not pd.isna(row.get("price")) else None),
-            price_per_m2=(float(row["price_per_m2"]) if not pd.isna(row.get("price_per_m2")) else None),
-            district=row.get("Distrito"),
-            city=row.get("Concelho"),
-            zone=row.get("Zone"),
-            typology=row.get("typology"),
-            agency=row.get("agency"),
-            address=row.get("address"),
-            tags=row.get("tag"),
-            parking=to_bool(row.get("parking")),
-            elevator=to_bool(row.get("elevador")),
-            new_construction=to_bool(row.get("nova_construcao")),
-            rented=to_bool(row.get("arrendada")),
-            trespasse=to_bool(row.get("trespasse")),
-            image_url=row.get("image_url"),
-            video_url=row.get("video_url"),
-            raw_json=None,
+    archived = (
+        db.query(models.ArchivedSnapshot.id)
+        .filter(models.ArchivedSnapshot.content_hash == content_hash)
+        .first()
+    )
+    if archived:
+        raise HTTPException(
+            status_code=409,
+            detail=f"This file was already ingested as snapshot {archived.id} (archived)",
         )
-        db.add(ps)
 
-    db.commit()
+
+async def ingest_files(db: Session, files, content_hash: str = None, ingest_id: str = None):
+    """
+    [(filename, bytes or path)] -> one new snapshot. Files given by path are
+    read from disk off the event loop. Progress is published as "ingest"
+    events under ingest_id (the upload id for chunked uploads).
+    """
+    progress = events.Progress(ingest_id, ", ".join(name for name, _ in files))
+    try:
+        content_hash = content_hash or await run_in_threadpool(ingest.content_hash, files)
+        await run_in_threadpool(ensure_not_ingested, db, content_hash)
+        files = await run_in_threadpool(ingest.expand_archives, files)
+        df = await ingest.parse_files(files, progress)
+        return await run_in_threadpool(ingest.load_snapshot, db, df, content_hash, progress)
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e) or type(e).__name__
+        await run_in_threadpool(progress.failed, detail)
+        raise
+
+
+@router.post("/upload", response_model=schemas.SnapshotOut)
+async def upload_snapshot(
+    file: UploadFile = File(...),
+    ingest_id: str = Query(None, max_length=64),
+    db: Session = Depends(database.get_db),
+):
+    check_filename(file.filename)
+    return await ingest_files(db, [(file.filename, await file.read())], ingest_id=ingest_id)
+
+
+@router.post("/upload_many", response_model=schemas.SnapshotOut)
+async def upload_snapshot_files(
+    files: List[UploadFile] = File(...),
+    ingest_id: str = Query(None, max_length=64),
+    db: Session = Depends(database.get_db),
+):
+    """Several exports (e.g. one per district) and/or zips -> a single snapshot."""
+    for f in files:
+        check_filename(f.filename)
+    return await ingest_files(db, [(f.filename, await f.read()) for f in files], ingest_id=ingest_id)
+
+
+# ---- Resumable chunked uploads (see app.uploads) ----
+@router.post("/uploads", response_model=schemas.UploadStatusOut)
+def init_upload(payload: schemas.UploadInitIn):
+    check_filename(payload.filename)
+    return uploads.create(payload.filename, payload.size, payload.sha256)
+
+
+@router.get("/uploads/{upload_id}", response_model=schemas.UploadStatusOut)
+def upload_status(upload_id: str):
+    return uploads.load(upload_id)
+
+
+@router.put("/uploads/{upload_id}", response_model=schemas.UploadStatusOut)
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    return await uploads.write_chunk(upload_id, offset, request.stream())
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=schemas.SnapshotOut)
+async def complete_upload(upload_id: str, db: Session = Depends(database.get_db)):
+    meta = uploads.load(upload_id)
+    if meta["snapshot_id"] is not None:
+        # a retried complete (e.g. the first response was lost)
+        snapshot = await run_in_threadpool(db.get, models.Snapshot, meta["snapshot_id"])
+        if not snapshot:
+            raise HTTPException(status_code=404, detail="Snapshot not found.")
+        return snapshot
+
+    # verify() hashes the spooled file; a wrong size or checksum fails here
+    content_hash = await run_in_threadpool(uploads.verify, upload_id)
+    # parsed straight from the spooled file, never loaded here as a whole
+    path = uploads.data_path(upload_id)
+    snapshot = await ingest_files(db, [(meta["filename"], path)], content_hash, ingest_id=upload_id)
+    uploads.mark_completed(upload_id, snapshot.id)
     return snapshot
 
 
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str):
+    uploads.remove(upload_id)
+    return {"status": "ok"}
+
+
 @router.delete("/{snapshot_id}")
 def delete_snapshot(snapshot_id: int, db: Session = Depends(database.get_db)):
     snap = db.query(models.Snapshot).get(snapshot_id)
@@ -161,4 +150,5 @@ def delete_snapshot(snapshot_id: int, db: Session = Depends(database.get_db)):
     db.query(models.PropertySnapshot).filter(models.PropertySnapshot.snapshot_id == snapshot_id).delete()
     db.delete(snap)
     db.commit()
+    ingest.after_delete(db)
     return {"status": "ok"}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Optional, List
 
 
 # ------------------------
@@ -30,6 +30,21 @@ class AnnotationOut(AnnotationBase):
         from_attributes = True
 
 
+class AnnotationBulkItem(AnnotationBase):
+    property_id: int
+
+
+class AnnotationBulkIn(BaseModel):
+    items: List[AnnotationBulkItem]
+
+
+class AnnotationBulkResultOut(BaseModel):
+    property_id: int
+    # "created" or "updated"
+    status: str
+    annotation: AnnotationOut
+
+
 # ------------------------
 # Property Schemas
 # ------------------------
@@ -59,6 +74,8 @@ class PropertySnapshotBase(BaseModel):
     price: Optional[float] = None
     price_per_m2: Optional[float] = None
     status: Optional[str] = None
+    deal_score: Optional[float] = None
+    deal_percentile: Optional[float] = None
     raw_json: Optional[str] = None
 
     district: Optional[str] = None
@@ -111,6 +128,27 @@ class SnapshotOut(SnapshotBase):
         from_attributes = True
 
 
+class SnapshotWithCountOut(SnapshotBase):
+    properties_count: int = 0
+
+
+class UploadInitIn(BaseModel):
+    filename: str
+    size: int
+    # optional hex sha256 of the whole file, checked on complete
+    sha256: Optional[str] = None
+
+
+class UploadStatusOut(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    received: int
+    # suggested chunk size for PUTs
+    chunk_size: int
+    snapshot_id: Optional[int] = None
+
+
 # ------------------------
 # Combined Property + Snapshot + Annotation
 # ------------------------
@@ -122,6 +160,76 @@ class PropertyFullOut(PropertyOut):
         from_attributes = True
 
 
+# ------------------------
+# Sparse listing schemas (fields= / include= projections)
+# Every field is optional; the route only sets the ones that were loaded and
+# responds with exclude_unset so unrequested columns never reach the payload.
+# ------------------------
+class PropertySnapshotSparseOut(PropertySnapshotBase):
+    id: Optional[int] = None
+    property_id: Optional[int] = None
+    snapshot_id: Optional[int] = None
+
+
+class PropertySparseOut(BaseModel):
+    id: int
+    property_id: Optional[str] = None
+    title: Optional[str] = None
+    url: Optional[str] = None
+    area: Optional[float] = None
+    typology: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    snapshots: Optional[List[PropertySnapshotSparseOut]] = None
+    annotations: Optional[List[AnnotationOut]] = None
+
+    class Config:
+        from_attributes = True
+
+
+# ------------------------
+# Price history (parallel arrays, one entry per snapshot)
+# ------------------------
+class PropertyHistoryOut(BaseModel):
+    property_id: int
+    dates: List[datetime] = []
+    price: List[Optional[float]] = []
+    price_per_m2: List[Optional[float]] = []
+    status: List[Optional[str]] = []
+
+
+class PropertyHistoryBatchIn(BaseModel):
+    property_ids: List[int]
+
+
+# ------------------------
+# Comparable listings
+# ------------------------
+class CompOut(BaseModel):
+    id: int
+    title: Optional[str] = None
+    area: Optional[float] = None
+    price: Optional[float] = None
+    price_per_m2: Optional[float] = None
+    typology: Optional[str] = None
+    zone: Optional[str] = None
+    city: Optional[str] = None
+    last_seen: Optional[datetime] = None
+    distance: float
+
+
+class PropertyCompsOut(BaseModel):
+    property_id: int
+    # "zone" or "city": which group the comps were drawn from
+    scope: str
+    comps: List[CompOut] = []
+
+
+class PropertyCompsBatchIn(BaseModel):
+    property_ids: List[int]
+    k: int = 20
+
+
 # ------------------------
 # Analytics Out Schemas
 # ------------------------
@@ -135,15 +243,85 @@ class PriceDistributionOut(BaseModel):
     min_price: Optional[float] = None
     max_price: Optional[float] = None
     median_price: Optional[float] = None
+    # the month includes archived snapshots: median_price is a listings-weighted
+    # mean of per-segment medians, not the exact median
+    median_approx: bool = False
 
 
 class ListingsPerMonthOut(BaseModel):
     month: str
     count: int
 
+class DistributionGroupOut(BaseModel):
+    group: Optional[str] = None
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    # "p5", "p25", ... -> value
+    percentiles: dict = {}
+    # counts per bin; values outside [lower, upper) land in underflow / overflow
+    histogram: List[int] = []
+    underflow: int = 0
+    overflow: int = 0
+
+
+class DistributionOut(BaseModel):
+    metric: str
+    group_by: str
+    lower: Optional[float] = None
+    upper: Optional[float] = None
+    bin_width: Optional[float] = None
+    groups: List[DistributionGroupOut] = []
+
+
+class CrosstabOut(BaseModel):
+    dims: List[str]
+    metric: str
+    # None = all snapshots
+    snapshot_id: Optional[int] = None
+    # one value list per dimension
+    axes: List[List[Optional[str]]]
+    # [index on axis 0, index on axis 1, (index on axis 2,) value, listings]
+    cells: List[list]
+    # more than MAX_CROSSTAB_CELLS non-empty cells: the ones with the most listings
+    # (ties broken by the dims' values) were kept, the rest was dropped
+    truncated: bool = False
+
+
 class PropertiesOptionsOut(BaseModel):
     districts: List[str]
     cities: List[str]
     zones: List[str]
     typologies: List[str]
-    agencies: List[str]
\ No newline at end of file
+    agencies: List[str]
+
+
+class SuggestionOut(BaseModel):
+    value: str
+    count: int
+
+# ------------------------
+# Debug Schemas
+# ------------------------
+class SlowQueryOut(BaseModel):
+    fingerprint: str
+    normalized: str
+    statement: str
+    parameters: Optional[Any] = None
+    duration_ms: float
+    captured_at: datetime
+    plan: Optional[Any] = None
+    plan_error: Optional[str] = None
+
+
+class ProfileOut(BaseModel):
+    id: str
+    method: str
+    path: str
+    status: Optional[int] = None
+    started_at: datetime
+    duration_ms: float
+    samples: int
+    sql_count: int
+    sql_ms: float
@@ -0,0 +1,146 @@
+# backend/app/slow_queries.py
+"""
+Slow-query log.
+
+Every statement slower than SLOW_QUERY_MS is captured (SQL, parameters,
+normalized fingerprint, duration) into a bounded ring buffer. A sample of the
+captured SELECTs is re-run as EXPLAIN (ANALYZE, BUFFERS) so the real plan is
+kept next to the capture:
+
+- only plain SELECT / WITH statements are explained (ANALYZE executes them),
+- on a separate connection, in a transaction that is always rolled back,
+- bounded by statement_timeout, one at a time, off the request thread.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from . import statements
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.2"))
+EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+
+# execution option used to keep the recorder from capturing its own EXPLAINs
+SKIP_OPTION = "slow_query_log"
+
+_buffer = deque(maxlen=BUFFER_SIZE)
+_lock = threading.Lock()
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_explain_pending = threading.Event()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+")
+_SPACES = re.compile(r"\s+")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+def fingerprint(statement: str) -> str:
+    """Statement with literals, placeholders and IN lists collapsed."""
+    s = _STRING.sub("?", statement)
+    s = _NUMBER.sub("?", s)
+    s = _PLACEHOLDER.sub("?", s)
+    s = _IN_LIST.sub("IN (...)", s)
+    return _SPACES.sub(" ", s).strip()
+
+
+def _jsonable(parameters):
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {k: _jsonable_value(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_jsonable_value(v) for v in parameters]
+    return repr(parameters)
+
+
+def _jsonable_value(v):
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, (list, tuple)):
+        return [_jsonable_value(x) for x in v]
+    return str(v)
+
+
+def captures():
+    with _lock:
+        return list(reversed(_buffer))
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+
+def _record(statement, parameters, duration_ms):
+    fp = fingerprint(statement)
+    entry = {
+        "fingerprint": hashlib.sha1(fp.encode()).hexdigest()[:16],
+        "normalized": fp,
+        "statement": statement,
+        "parameters": _jsonable(parameters),
+        "duration_ms": round(duration_ms, 2),
+        "captured_at": datetime.utcnow(),
+        "plan": None,
+        "plan_error": None,
+    }
+    with _lock:
+        _buffer.append(entry)
+    return entry
+
+
+def _explain(engine, entry, statement, parameters):
+    try:
+        with engine.connect() as conn:
+            conn = conn.execution_options(**{SKIP_OPTION: False})
+            with conn.begin() as tx:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                explain = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement
+                if parameters:
+                    result = conn.exec_driver_sql(explain, parameters)
+                else:
+                    result = conn.exec_driver_sql(explain)
+                entry["plan"] = result.scalar()
+                tx.rollback()
+    except Exception as e:
+        entry["plan_error"] = str(e)
+        logger.warning("EXPLAIN of slow query %s failed: %s", entry["fingerprint"], e)
+    finally:
+        _explain_pending.clear()
+
+
+def _should_explain(engine, statement, executemany) -> bool:
+    return (
+        engine.dialect.name == "postgresql"
+        and not executemany
+        and _EXPLAINABLE.match(statement) is not None
+        and random.random() < EXPLAIN_SAMPLE_RATE
+        and not _explain_pending.is_set()
+    )
+
+
+def install_engine_hooks(engine):
+    def _after(conn, cursor, statement, parameters, context, executemany, started, duration):
+        duration_ms = duration * 1000
+        if duration_ms < SLOW_QUERY_MS:
+            return
+        if not conn.get_execution_options().get(SKIP_OPTION, True):
+            return
+
+        entry = _record(statement, parameters, duration_ms)
+        if _should_explain(engine, statement, executemany):
+            _explain_pending.set()
+            _explainer.submit(_explain, engine, entry, statement, parameters)
+
+    statements.on_statement(engine, _after)
@@ -0,0 +1,101 @@
+# backend/app/statements.py
+"""
+Per-shape statement cache.
+
+Hot read paths build their SQLAlchemy statement once per filter shape (the set
+of active filters, not their values) with bound parameters, keep it here and
+only bind new values on later requests. Because the same statement object is
+reused, SQLAlchemy's compiled cache hits on every repeat and, with psycopg 3,
+the server-side prepared statement is reused as well.
+
+Also the one place statements are timed: on_statement() subscribers (metrics,
+slow-query log, profiler) get the start time and duration of every statement.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Integer, any_, bindparam, event
+from sqlalchemy.dialects.postgresql import ARRAY
+
+# name -> StatementCache, read by metrics.render()
+caches = {}
+
+
+class StatementCache:
+    def __init__(self, name: str, maxsize: int = 256):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        caches[name] = self
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+        stmt = build()
+        with self._lock:
+            self._data[key] = stmt
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return stmt
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def in_ids(column, name: str, dialect: str):
+    """
+    column IN (<list bound as name>). On Postgres the list is one array
+    parameter (= ANY(:name)): no per-id parameters, so no 65,535-parameter
+    limit and one statement for any list length.
+    """
+    if dialect == "postgresql":
+        return column == any_(bindparam(name, type_=ARRAY(Integer)))
+    return column.in_(bindparam(name, expanding=True))
+
+
+# ---- Statement timing ----
+_START = "statement_start"
+_subscribers = {}  # engine -> [callback]
+
+
+def on_statement(engine, callback):
+    """
+    Calls callback(conn, cursor, statement, parameters, context, executemany,
+    started, duration_s) after every statement engine runs; started is a
+    time.perf_counter() value. Failed statements are not reported.
+    """
+    if engine not in _subscribers:
+        _subscribers[engine] = []
+        _install(engine)
+    _subscribers[engine].append(callback)
+
+
+def _install(engine):
+    callbacks = _subscribers[engine]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_START, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info[_START].pop()
+        duration = time.perf_counter() - started
+        for callback in callbacks:
+            callback(conn, cursor, statement, parameters, context, executemany, started, duration)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # a failed statement never reaches after_cursor_execute
+        conn = context.connection
+        if conn is not None and conn.info.get(_START):
+            conn.info[_START].pop()
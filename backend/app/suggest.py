@@ -0,0 +1,127 @@
+# backend/app/suggest.py
+"""
+Typeahead for addresses, zones and agencies.
+
+The index holds, per field, every distinct value of the latest listing rows
+with its listing count. Keys are accent- and case-folded ("São João" ->
+"sao joao") and every word start is a key of its own, so "joao" finds
+"Rua de São João". Keys live in one sorted list: a prefix is a bisect range,
+and the answers for prefixes of up to PRECOMPUTE_CHARS characters (the ranges
+that would be large) are computed at build time. A request never touches
+property_snapshots.
+
+Rebuilt lazily like the comps index: invalidate() after an upload/delete in
+this worker, and every SUGGEST_REFRESH_S seconds a (count, max id) check over
+snapshots picks up changes made by other workers.
+"""
+import heapq
+import os
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from sqlalchemy import func, select
+
+from . import models
+
+REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_S", "30"))
+PRECOMPUTE_CHARS = 2
+MAX_LIMIT = 50
+
+PS = models.PropertySnapshot
+FIELDS = {"address": PS.address, "zone": PS.zone, "agency": PS.agency}
+
+
+def fold(value: str) -> str:
+    """Lowercase, accents stripped, whitespace collapsed."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class _FieldIndex:
+    def __init__(self, counted):
+        """counted: [(value, listings)] sorted by value."""
+        self.values = [v for v, _ in counted]
+        self.counts = [n for _, n in counted]
+        pairs = []
+        for i, value in enumerate(self.values):
+            words = fold(value).split(" ")
+            pairs.extend((" ".join(words[w:]), i) for w in range(len(words)))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.entries = [i for _, i in pairs]
+
+        buckets = {}
+        for key, i in pairs:
+            for n in range(1, min(PRECOMPUTE_CHARS, len(key)) + 1):
+                buckets.setdefault(key[:n], set()).add(i)
+        self.top = {prefix: self._best(ids, MAX_LIMIT) for prefix, ids in buckets.items()}
+
+    def _best(self, ids, limit):
+        # most listings first, then alphabetical (values are sorted)
+        return heapq.nlargest(limit, ids, key=lambda i: (self.counts[i], -i))
+
+    def complete(self, prefix: str, limit: int):
+        key = fold(prefix)
+        if not key:
+            return []
+        ids = self.top.get(key)
+        if ids is None:
+            lo = bisect_left(self.keys, key)
+            hi = bisect_left(self.keys, key + "\U0010ffff", lo)
+            ids = self._best(set(self.entries[lo:hi]), limit)
+        return [{"value": self.values[i], "count": self.counts[i]} for i in ids[:limit]]
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.signature = None
+        self.checked_at = 0.0
+        self.stale = True
+        self.fields = {}            # field -> _FieldIndex
+
+    # ---- maintenance ----
+    def invalidate(self):
+        self.stale = True
+
+    def sync(self, db):
+        now = time.monotonic()
+        if not self.stale and now - self.checked_at < REFRESH_SECONDS:
+            return
+        signature = tuple(db.query(func.count(models.Snapshot.id), func.max(models.Snapshot.id)).one())
+        with self._lock:
+            if self.stale or signature != self.signature:
+                self._build(db)
+                self.signature = signature
+                self.stale = False
+            self.checked_at = now
+
+    def _build(self, db):
+        latest_ids = select(func.max(PS.id)).group_by(PS.property_id)
+        fields = {}
+        for name, col in FIELDS.items():
+            counted = (
+                db.query(col, func.count())
+                .filter(PS.id.in_(latest_ids), col.isnot(None), col != "")
+                .group_by(col)
+                .order_by(col)
+                .all()
+            )
+            fields[name] = _FieldIndex([(v, n) for v, n in counted])
+        # swapped in whole: queries never see a half-built index
+        self.fields = fields
+
+    # ---- queries ----
+    def complete(self, field: str, prefix: str, limit: int):
+        return self.fields[field].complete(prefix, limit)
+
+
+index = SuggestIndex()
+
+
+def get_index(db):
+    index.sync(db)
+    return index
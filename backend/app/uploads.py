@@ -0,0 +1,169 @@
+# backend/app/uploads.py
+"""
+Resumable chunked uploads, spooled to local disk.
+
+    POST   /snapshots/uploads                  init  -> upload_id
+    PUT    /snapshots/uploads/{id}?offset=N    write a chunk at offset N
+    GET    /snapshots/uploads/{id}             how many bytes arrived (resume point)
+    POST   /snapshots/uploads/{id}/complete    hash, de-duplicate, ingest
+    DELETE /snapshots/uploads/{id}             abort
+
+All state lives in UPLOAD_DIR/<id>/ (meta.json + data.part), never in worker
+memory, so any worker can take any chunk. The number of bytes received is the
+size of data.part; chunks may be re-sent (offset <= received) but not skip
+ahead. Sessions untouched for UPLOAD_TTL_HOURS are removed on the next init.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/property-uploads")
+CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+TTL_SECONDS = float(os.getenv("UPLOAD_TTL_HOURS", "24")) * 3600
+
+_HASH_BLOCK = 1024 * 1024
+_WRITE_BLOCK = 1024 * 1024
+
+
+def _dir(upload_id: str) -> str:
+    # ids are uuid4 hex; anything else never reaches the filesystem
+    try:
+        valid = uuid.UUID(hex=upload_id).hex == upload_id
+    except ValueError:
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return os.path.join(UPLOAD_DIR, upload_id)
+
+
+def data_path(upload_id: str) -> str:
+    return os.path.join(_dir(upload_id), "data.part")
+
+
+def _write_meta(upload_id: str, meta: dict):
+    path = os.path.join(_dir(upload_id), "meta.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp, path)
+
+
+def load(upload_id: str) -> dict:
+    try:
+        with open(os.path.join(_dir(upload_id), "meta.json")) as fh:
+            meta = json.load(fh)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    path = data_path(upload_id)
+    meta["received"] = os.path.getsize(path) if os.path.exists(path) else meta["size"]
+    meta["chunk_size"] = CHUNK_BYTES
+    return meta
+
+
+def purge_expired(now: float = None):
+    now = now or time.time()
+    if not os.path.isdir(UPLOAD_DIR):
+        return
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        try:
+            # chunk writes touch the files, not the directory
+            touched = max(os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path))
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            continue
+        if now - touched > TTL_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def create(filename: str, size: int, sha256: str = None) -> dict:
+    if size <= 0 or size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail=f"size must be between 1 and {MAX_UPLOAD_BYTES} bytes")
+    purge_expired()
+    upload_id = uuid.uuid4().hex
+    os.makedirs(_dir(upload_id))
+    open(data_path(upload_id), "wb").close()
+    meta = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "created_at": datetime.utcnow().isoformat(),
+        "snapshot_id": None,
+    }
+    _write_meta(upload_id, meta)
+    return load(upload_id)
+
+
+async def write_chunk(upload_id: str, offset: int, stream) -> dict:
+    meta = await run_in_threadpool(load, upload_id)
+    if meta["snapshot_id"] is not None:
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    if offset > meta["received"]:
+        raise HTTPException(status_code=409, detail=f"offset {offset} is past the {meta['received']} bytes received")
+
+    # file I/O runs in the threadpool, in writes of up to _WRITE_BLOCK bytes
+    end = offset
+    fh = await run_in_threadpool(open, data_path(upload_id), "r+b")
+    try:
+        await run_in_threadpool(fh.seek, offset)
+        pending = bytearray()
+        async for block in stream:
+            end += len(block)
+            if end > meta["size"]:
+                raise HTTPException(status_code=400, detail="Chunk goes past the declared size")
+            pending += block
+            if len(pending) >= _WRITE_BLOCK:
+                await run_in_threadpool(fh.write, bytes(pending))
+                pending.clear()
+        if pending:
+            await run_in_threadpool(fh.write, bytes(pending))
+    finally:
+        await run_in_threadpool(fh.close)
+    return await run_in_threadpool(load, upload_id)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def verify(upload_id: str) -> str:
+    """Checks the upload is whole and returns its sha256."""
+    meta = load(upload_id)
+    if meta["received"] != meta["size"]:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {meta['received']} of {meta['size']} bytes")
+    digest = file_sha256(data_path(upload_id))
+    if meta["sha256"] and meta["sha256"] != digest:
+        raise HTTPException(status_code=400, detail="sha256 of the received file does not match the one given at init")
+    return digest
+
+
+def mark_completed(upload_id: str, snapshot_id: int):
+    """Keeps only meta.json, so repeating /complete returns the same snapshot."""
+    meta = load(upload_id)
+    meta.pop("received", None)
+    meta.pop("chunk_size", None)
+    meta["snapshot_id"] = snapshot_id
+    _write_meta(upload_id, meta)
+    try:
+        os.remove(data_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def remove(upload_id: str):
+    path = _dir(upload_id)
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,346 @@
+# backend/bench/generate.py
+"""
+Reproducible synthetic listing data.
+
+Produces Portuguese-looking listings (district / concelho / zone, typologies,
+agencies, log-normal prices) and a weekly snapshot series with churn:
+listings appear, disappear and get price drops from week to week. The same
+--seed always produces the same data.
+
+Rows are written in the same column layout the /snapshots/upload endpoint
+expects, one file per weekly snapshot, or loaded straight into the database.
+
+    python -m bench.generate --rows 100000 --weeks 10 --out /tmp/synth --format csv
+    python -m bench.generate --rows 1000000 --weeks 20 --db
+"""
+import argparse
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# district -> concelho -> zones, with a base €/m2 for the district
+GEOGRAPHY = {
+    "Lisboa": (4200, {
+        "Lisboa": ["Avenidas Novas", "Alvalade", "Arroios", "Belém", "Campo de Ourique", "Parque das Nações"],
+        "Cascais": ["Cascais e Estoril", "Carcavelos e Parede", "Alcabideche"],
+        "Oeiras": ["Algés", "Paço de Arcos", "Oeiras e São Julião da Barra"],
+        "Sintra": ["Agualva e Mira-Sintra", "Queluz e Belas", "Rio de Mouro"],
+        "Loures": ["Sacavém", "Moscavide e Portela", "Santa Iria de Azóia"],
+    }),
+    "Porto": (2900, {
+        "Porto": ["Bonfim", "Campanhã", "Cedofeita", "Foz do Douro", "Paranhos", "Ramalde"],
+        "Vila Nova de Gaia": ["Mafamude e Vilar do Paraíso", "Canidelo", "Oliveira do Douro"],
+        "Matosinhos": ["Matosinhos e Leça da Palmeira", "Senhora da Hora", "Custóias"],
+        "Maia": ["Cidade da Maia", "Águas Santas", "Moreira"],
+    }),
+    "Setúbal": (2300, {
+        "Almada": ["Almada, Cova da Piedade, Pragal e Cacilhas", "Charneca de Caparica e Sobreda"],
+        "Seixal": ["Amora", "Seixal, Arrentela e Aldeia de Paio Pires"],
+        "Setúbal": ["São Sebastião", "Setúbal (São Julião)"],
+    }),
+    "Faro": (3100, {
+        "Faro": ["Sé e São Pedro", "Montenegro"],
+        "Loulé": ["Quarteira", "Almancil", "Loulé (São Clemente)"],
+        "Lagos": ["São Gonçalo de Lagos", "Luz"],
+        "Albufeira": ["Albufeira e Olhos de Água", "Guia"],
+    }),
+    "Braga": (1600, {
+        "Braga": ["São Vicente", "Maximinos, Sé e Cividade", "Real, Dume e Semelhe"],
+        "Guimarães": ["Oliveira, São Paio e São Sebastião", "Azurém"],
+    }),
+    "Coimbra": (1700, {
+        "Coimbra": ["Santo António dos Olivais", "Sé Nova, Santa Cruz, Almedina e São Bartolomeu"],
+        "Figueira da Foz": ["Buarcos e São Julião", "Tavarede"],
+    }),
+    "Aveiro": (1800, {
+        "Aveiro": ["Glória e Vera Cruz", "Esgueira"],
+        "Santa Maria da Feira": ["Santa Maria da Feira, Travanca, Sanfins e Espargo"],
+    }),
+    "Leiria": (1400, {
+        "Leiria": ["Leiria, Pousos, Barreira e Cortes", "Marrazes e Barosa"],
+        "Caldas da Rainha": ["Nossa Senhora do Pópulo, Coto e São Gregório"],
+    }),
+}
+
+# typology -> (relative weight, mean area m2, €/m2 multiplier)
+TYPOLOGIES = {
+    "T0": (0.06, 38, 1.20),
+    "T1": (0.18, 58, 1.12),
+    "T2": (0.26, 85, 1.00),
+    "T3": (0.20, 120, 0.95),
+    "T4": (0.07, 165, 0.95),
+    "T5": (0.02, 230, 1.00),
+    "Loja": (0.08, 110, 0.85),
+    "Armazém": (0.04, 450, 0.40),
+    "Escritório": (0.05, 140, 0.90),
+    "Terreno": (0.04, 900, 0.12),
+}
+
+AGENCIES = [
+    "ERA", "RE/MAX", "Century 21", "KW Portugal", "Decisões e Soluções", "Zome",
+    "iad Portugal", "Engel & Völkers", "JLL", "Predimed", "Casa Sapo Imobiliária",
+    "Particular", "Imovirtual Pro", "Sotheby's Realty", "Savills",
+]
+STREETS = ["Rua", "Avenida", "Travessa", "Largo", "Praceta", "Estrada"]
+NAMES = [
+    "da Liberdade", "de Santa Catarina", "do Comércio", "da República", "dos Aliados",
+    "de São João", "Dom Manuel II", "da Boavista", "Central", "das Flores", "do Mar",
+]
+TAGS = ["", "", "", "Luxo", "Para remodelar", "Vista mar", "Com terraço", "Exclusivo"]
+
+COLUMNS = [
+    "date_scraped", "Distrito", "Concelho", "Zone", "id", "href", "title", "price",
+    "price_per_m2", "area", "typology", "agency", "parking", "address", "tag",
+    "arrendada", "elevador", "nova_construcao", "trespasse", "image_url", "video_url",
+]
+
+# weekly churn
+DELIST_RATE = 0.05
+NEW_RATE = 0.055
+PRICE_CHANGE_RATE = 0.08
+
+
+class ListingPool:
+    """Current active listings as parallel NumPy arrays."""
+
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.next_id = 1
+        self.zones = [
+            (district, city, zone, base)
+            for district, (base, cities) in GEOGRAPHY.items()
+            for city, zones in cities.items()
+            for zone in zones
+        ]
+        # bigger districts list more
+        weights = np.array([z[3] for z in self.zones], dtype=float)
+        self.zone_p = weights / weights.sum()
+        self.typ_names = list(TYPOLOGIES)
+        typ_w = np.array([TYPOLOGIES[t][0] for t in self.typ_names])
+        self.typ_p = typ_w / typ_w.sum()
+        self.cols = {}
+
+    def spawn(self, n: int) -> dict:
+        rng = self.rng
+        zone_idx = rng.choice(len(self.zones), size=n, p=self.zone_p)
+        typ_idx = rng.choice(len(self.typ_names), size=n, p=self.typ_p)
+        mean_area = np.array([TYPOLOGIES[self.typ_names[t]][1] for t in typ_idx])
+        mult = np.array([TYPOLOGIES[self.typ_names[t]][2] for t in typ_idx])
+        base = np.array([self.zones[z][3] for z in zone_idx])
+        # zone-level premium is stable per zone, listing noise is log-normal
+        zone_premium = 0.75 + (np.array(zone_idx) * 7919 % 50) / 100
+        area = np.round(rng.lognormal(np.log(mean_area), 0.3), 0).clip(15, None)
+        ppm2 = base * mult * zone_premium * rng.lognormal(0, 0.18, size=n)
+        price = np.round(area * ppm2 / 500, 0) * 500
+        ids = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        return {
+            "id": ids,
+            "zone": zone_idx,
+            "typology": typ_idx,
+            "area": area,
+            "price": price,
+            "agency": rng.integers(0, len(AGENCIES), size=n),
+            "street": rng.integers(0, len(STREETS) * len(NAMES), size=n),
+            "number": rng.integers(1, 400, size=n),
+            "tag": rng.integers(0, len(TAGS), size=n),
+            "flags": rng.random((n, 5)) < np.array([0.35, 0.45, 0.12, 0.05, 0.03]),
+        }
+
+    def start(self, n: int):
+        self.cols = self.spawn(n)
+
+    def advance_week(self):
+        rng = self.rng
+        n = len(self.cols["id"])
+        keep = rng.random(n) >= DELIST_RATE
+        cols = {k: v[keep] for k, v in self.cols.items()}
+        # price changes, mostly reductions
+        change = rng.random(len(cols["id"])) < PRICE_CHANGE_RATE
+        factor = np.where(rng.random(change.sum()) < 0.8, rng.uniform(0.9, 0.99, change.sum()),
+                          rng.uniform(1.01, 1.08, change.sum()))
+        cols["price"] = cols["price"].copy()
+        cols["price"][change] = np.round(cols["price"][change] * factor / 500, 0) * 500
+        new = self.spawn(int(n * NEW_RATE))
+        self.cols = {k: np.concatenate([cols[k], new[k]]) for k in cols}
+
+    def rows(self, scraped: datetime):
+        c = self.cols
+        date_s = scraped.strftime("%Y-%m-%d")
+        for i in range(len(c["id"])):
+            district, city, zone, _ = self.zones[c["zone"][i]]
+            typ = self.typ_names[c["typology"][i]]
+            area = float(c["area"][i])
+            price = float(c["price"][i])
+            street = c["street"][i]
+            ext_id = f"SYN{c['id'][i]:08d}"
+            flags = c["flags"][i]
+            yield {
+                "date_scraped": date_s,
+                "Distrito": district,
+                "Concelho": city,
+                "Zone": zone,
+                "id": ext_id,
+                "href": f"https://www.idealista.pt/imovel/{ext_id}/",
+                "title": f"{typ} em {zone}, {city}",
+                "price": price,
+                "price_per_m2": round(price / area, 2),
+                "area": area,
+                "typology": typ,
+                "agency": AGENCIES[c["agency"][i]],
+                "parking": int(flags[0]),
+                "address": f"{STREETS[street % len(STREETS)]} {NAMES[street // len(STREETS)]}, {c['number'][i]}",
+                "tag": TAGS[c["tag"][i]],
+                "arrendada": int(flags[3]),
+                "elevador": int(flags[1]),
+                "nova_construcao": int(flags[2]),
+                "trespasse": int(flags[4]),
+                "image_url": f"https://img.example.pt/{ext_id}.jpg",
+                "video_url": "",
+            }
+
+
+def weekly_snapshots(rows: int, weeks: int, seed: int = 42, start: datetime = None):
+    """
+    Yields (upload_date, row iterator) per week so that the total number of
+    snapshot rows is roughly `rows`.
+    """
+    rng = np.random.default_rng(seed)
+    pool = ListingPool(rng)
+    pool.start(max(1, rows // weeks))
+    start = start or datetime(2024, 1, 1)
+    for week in range(weeks):
+        if week:
+            pool.advance_week()
+        when = start + timedelta(weeks=week)
+        yield when, pool.rows(when)
+
+
+# ---- writers ----
+def write_files(rows: int, weeks: int, out_dir: str, fmt: str = "csv", seed: int = 42):
+    import pandas as pd
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for when, it in weekly_snapshots(rows, weeks, seed):
+        path = os.path.join(out_dir, f"snapshot_{when:%Y%m%d}.{fmt}")
+        if fmt == "csv":
+            with open(path, "w", newline="", encoding="utf-8") as fh:
+                w = csv.DictWriter(fh, fieldnames=COLUMNS)
+                w.writeheader()
+                w.writerows(it)
+        else:
+            # xlsx tops out at 1,048,576 rows per sheet
+            pd.DataFrame(list(it), columns=COLUMNS).to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def load_into_db(rows: int, weeks: int, seed: int = 42, batch: int = 50_000):
+    """Bulk load straight into the database (COPY on Postgres, executemany elsewhere)."""
+    from sqlalchemy import insert
+    from app import models
+    from app.database import engine
+
+    prop_ids = {}  # external id -> properties.id
+    total = 0
+    with engine.begin() as conn:
+        for when, it in weekly_snapshots(rows, weeks, seed):
+            snapshot_id = conn.execute(
+                insert(models.Snapshot).values(upload_date=when).returning(models.Snapshot.id)
+            ).scalar_one()
+
+            props, snaps = [], []
+            for r in it:
+                if r["id"] not in prop_ids:
+                    props.append({
+                        "property_id": r["id"], "title": r["title"], "url": r["href"],
+                        "area": r["area"], "typology": r["typology"],
+                    })
+                snaps.append(r)
+            for i in range(0, len(props), batch):
+                chunk = props[i:i + batch]
+                ids = conn.execute(
+                    insert(models.Property).returning(models.Property.id, models.Property.property_id),
+                    chunk,
+                ).all()
+                prop_ids.update({ext: pk for pk, ext in ids})
+
+            snap_rows = [
+                {
+                    "snapshot_id": snapshot_id,
+                    "property_id": prop_ids[r["id"]],
+                    "price": r["price"],
+                    "price_per_m2": r["price_per_m2"],
+                    "district": r["Distrito"],
+                    "city": r["Concelho"],
+                    "zone": r["Zone"],
+                    "typology": r["typology"],
+                    "agency": r["agency"],
+                    "address": r["address"],
+                    "tags": r["tag"] or None,
+                    "parking": bool(r["parking"]),
+                    "elevator": bool(r["elevador"]),
+                    "new_construction": bool(r["nova_construcao"]),
+                    "rented": bool(r["arrendada"]),
+                    "trespasse": bool(r["trespasse"]),
+                    "image_url": r["image_url"],
+                    "video_url": r["video_url"] or None,
+                }
+                for r in snaps
+            ]
+            _bulk_insert(conn, models.PropertySnapshot.__table__, snap_rows, batch)
+            total += len(snap_rows)
+            print(f"{when:%Y-%m-%d}: {len(snap_rows)} rows (total {total})")
+    return total
+
+
+def _bulk_insert(conn, table, rows, batch):
+    if not rows:
+        return
+    if conn.dialect.name != "postgresql":
+        for i in range(0, len(rows), batch):
+            conn.execute(table.insert(), rows[i:i + batch])
+        return
+
+    cols = list(rows[0])
+    raw = conn.connection.dbapi_connection
+    with raw.cursor() as cur:
+        for i in range(0, len(rows), batch):
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            for r in rows[i:i + batch]:
+                w.writerow(["\\N" if r[c] is None else r[c] for c in cols])
+            sql = f"COPY {table.name} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+            if hasattr(cur, "copy_expert"):  # psycopg2
+                buf.seek(0)
+                cur.copy_expert(sql, buf)
+            else:  # psycopg 3
+                with cur.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="total snapshot rows (approx.)")
+    parser.add_argument("--weeks", type=int, default=10, help="number of weekly snapshots")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="directory for one file per snapshot")
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    parser.add_argument("--db", action="store_true", help="load directly into DATABASE_URL")
+    args = parser.parse_args()
+
+    if not args.out and not args.db:
+        parser.error("pass --out and/or --db")
+    if args.out:
+        for p in write_files(args.rows, args.weeks, args.out, args.format, args.seed):
+            print(p)
+    if args.db:
+        load_into_db(args.rows, args.weeks, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# backend/bench/run.py
+"""
+Endpoint benchmark harness.
+
+Times snapshot ingest, a set of /properties/ filter combinations, /options and
+every analytics endpoint against a running backend. Results are written as
+JSON to bench/results/ and compared against the previous run (or --baseline):
+any case whose median got slower than --threshold is flagged, and the exit
+code is 1 so CI can catch it.
+
+    python -m bench.run --base-url http://localhost:8000 --repeat 20
+    python -m bench.run --ingest /tmp/synth/snapshot_20240101.csv
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# (name, path, query params)
+CASES = [
+    ("properties.all", "/properties/", {}),
+    ("properties.district", "/properties/", {"district": "Porto"}),
+    ("properties.district_city_zone", "/properties/", {"district": "Porto", "city": "Porto", "zone": "Bonfim"}),
+    ("properties.city_typology", "/properties/", {"city": "Lisboa", "typology": ["T2", "T3"]}),
+    ("properties.price_range", "/properties/", {"min_price": 150000, "max_price": 400000}),
+    ("properties.ppm2_area", "/properties/", {"min_price_per_m2": 2000, "min_area": 60, "max_area": 120}),
+    ("properties.search_address", "/properties/", {"search_address": "Rua"}),
+    ("properties.search_area", "/properties/", {"search_address": "Avenida", "min_area": 80}),
+    ("properties.flags", "/properties/", {"parking": "true", "elevator": "true"}),
+    ("properties.card_fields", "/properties/", {
+        "district": "Lisboa", "fields": "title,price,price_per_m2,image_url", "include": "latest",
+    }),
+    ("options.all", "/properties/options", {}),
+    ("options.district", "/properties/options", {"district": "Lisboa"}),
+    ("analytics.avg_price_per_m2", "/analytics/avg_price_per_m2", {}),
+    ("analytics.avg_price_per_m2.filtered", "/analytics/avg_price_per_m2", {"district": "Porto", "typology": ["T2"]}),
+    ("analytics.price_distribution", "/analytics/price_distribution", {}),
+    ("analytics.price_distribution.filtered", "/analytics/price_distribution", {"city": "Lisboa", "min_area": 50}),
+    ("analytics.listings_per_month", "/analytics/listings_per_month", {}),
+    ("analytics.listings_per_month.filtered", "/analytics/listings_per_month", {"zone": "Bonfim"}),
+    ("analytics.distribution", "/analytics/distribution", {}),
+    ("analytics.distribution.zone", "/analytics/distribution", {"group_by": "zone", "metric": "price", "bins": 50}),
+    ("analytics.crosstab", "/analytics/crosstab", {"dims": "zone,typology", "metric": "median_ppm2"}),
+    ("analytics.crosstab.all", "/analytics/crosstab", {"dims": "agency,zone", "snapshot": "all"}),
+    ("snapshots.list", "/snapshots/", {}),
+]
+
+
+def _request(url, method="GET", body=None, headers=None):
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        payload = resp.read()
+        status = resp.status
+    return time.perf_counter() - started, status, len(payload)
+
+
+def _multipart(path):
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as fh:
+        data = fh.read()
+    name = os.path.basename(path)
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def _summary(samples, status, size):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "runs": len(ms),
+        "status": status,
+        "bytes": size,
+        "min_ms": round(ms[0], 2),
+        "p50_ms": round(statistics.median(ms), 2),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+        "mean_ms": round(statistics.fmean(ms), 2),
+    }
+
+
+def run_cases(base_url, repeat, warmup=1, cases=CASES):
+    results = {}
+    for name, path, params in cases:
+        url = base_url.rstrip("/") + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params, doseq=True)
+        try:
+            for _ in range(warmup):
+                _request(url)
+            samples = []
+            for _ in range(repeat):
+                elapsed, status, size = _request(url)
+                samples.append(elapsed)
+            results[name] = _summary(samples, status, size)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+        print(f"{name:45s} {_fmt(results[name])}")
+    return results
+
+
+def run_ingest(base_url, paths):
+    results = {}
+    for path in paths:
+        body, headers = _multipart(path)
+        try:
+            elapsed, status, size = _request(
+                base_url.rstrip("/") + "/snapshots/upload", "POST", body, headers
+            )
+            with open(path, "rb") as fh:
+                rows = sum(1 for _ in fh) - 1 if path.endswith(".csv") else None
+            r = _summary([elapsed], status, size)
+            r["rows"] = rows
+            if rows:
+                r["rows_per_s"] = round(rows / elapsed, 1)
+        except Exception as e:
+            r = {"error": str(e)}
+        name = f"ingest.{os.path.basename(path)}"
+        results[name] = r
+        print(f"{name:45s} {_fmt(r)}")
+    return results
+
+
+def _fmt(r):
+    if "error" in r:
+        return f"ERROR {r['error']}"
+    return f"p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  {r['bytes']:>10d} B"
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def latest_result(exclude=None):
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    paths = [p for p in paths if p != exclude]
+    return paths[-1] if paths else None
+
+
+def compare(current, baseline, threshold):
+    """Names of cases whose p50 regressed by more than `threshold` (0.2 = 20%)."""
+    regressions = []
+    for name, r in current.items():
+        b = baseline.get(name)
+        if not b or "p50_ms" not in r or "p50_ms" not in b:
+            continue
+        if r["p50_ms"] > b["p50_ms"] * (1 + threshold):
+            regressions.append((name, b["p50_ms"], r["p50_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("BENCH_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--ingest", nargs="*", default=[], help="files to upload before the read cases")
+    parser.add_argument("--only", help="run only cases whose name starts with this prefix")
+    parser.add_argument("--label", help="free-form label stored with the results")
+    parser.add_argument("--baseline", help="results file to compare against (default: previous run)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    cases = [c for c in CASES if not args.only or c[0].startswith(args.only)]
+    results = run_ingest(args.base_url, args.ingest)
+    results.update(run_cases(args.base_url, args.repeat, cases=cases))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S%f}.json")
+    with open(out_path, "w") as fh:
+        json.dump({
+            "created_at": datetime.utcnow().isoformat(),
+            "git_rev": _git_rev(),
+            "label": args.label,
+            "base_url": args.base_url,
+            "repeat": args.repeat,
+            "results": results,
+        }, fh, indent=2)
+    print(f"\nresults: {out_path}")
+
+    baseline_path = args.baseline or latest_result(exclude=out_path)
+    if not baseline_path:
+        return 0
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    print(f"baseline: {baseline_path}")
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: p50 {before:.2f} ms -> {after:.2f} ms")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
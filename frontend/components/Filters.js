@@ -42,6 +42,10 @@ export default function Filters({ onChange }) {
   // Search
   const [searchAddress, setSearchAddress] = useState("");
   const [searchTags, setSearchTags] = useState("");
+  // what is typed; only applied as a filter on pick / Enter / blur, so typing
+  // hits the in-memory /properties/suggest index instead of the listing search
+  const [addressInput, setAddressInput] = useState("");
+  const [addressSuggestions, setAddressSuggestions] = useState([]);
 
   // ---- helpers ----
   const parseNum = (v) => {
@@ -68,6 +72,30 @@ export default function Filters({ onChange }) {
     return eligible.length ? eligible : undefined;
   }, [minTypology, tTypologies]);
 
+  // ---- address typeahead ----
+  useEffect(() => {
+    const q = addressInput.trim();
+    if (!q) {
+      setAddressSuggestions([]);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const res = await api.get("/properties/suggest", { params: { field: "address", q, limit: 10 } });
+        setAddressSuggestions(res.data || []);
+      } catch (err) {
+        console.error("Error loading suggestions:", err);
+      }
+    }, 150);
+    return () => clearTimeout(timer);
+  }, [addressInput]);
+
+  const onAddressInput = (value) => {
+    setAddressInput(value);
+    // picking an entry from the datalist
+    if (addressSuggestions.some((s) => s.value === value)) setSearchAddress(value);
+  };
+
   // ---- load options ----
   // Initial options
   useEffect(() => {
@@ -194,6 +222,7 @@ export default function Filters({ onChange }) {
     setMaxArea("");
 
     setSearchAddress("");
+    setAddressInput("");
     setSearchTags("");
 
     setParking(false);
@@ -365,9 +394,19 @@ export default function Filters({ onChange }) {
           type="text"
           className="w-full border rounded p-2 mt-1"
           placeholder="e.g., Rua ..."
-          value={searchAddress}
-          onChange={(e) => setSearchAddress(e.target.value)}
+          list="address-suggestions"
+          value={addressInput}
+          onChange={(e) => onAddressInput(e.target.value)}
+          onKeyDown={(e) => e.key === "Enter" && setSearchAddress(addressInput)}
+          onBlur={() => setSearchAddress(addressInput)}
         />
+        <datalist id="address-suggestions">
+          {addressSuggestions.map((s) => (
+            <option key={s.value} value={s.value}>
+              {s.count} listings
+            </option>
+          ))}
+        </datalist>
       </div>
 
       <div>
@@ -10,6 +10,17 @@ export default function PropertyCard({ property, onAnnotationChange }) {
   const [interesting, setInteresting] = useState(ann.interesting ?? "");
   const [notes, setNotes] = useState(ann.notes ?? "");
   const [saving, setSaving] = useState(false);
+  const [history, setHistory] = useState(null); // lazy-loaded on demand
+
+  const toggleHistory = async () => {
+    if (history) return setHistory(null);
+    try {
+      const res = await api.get(`/properties/${property.id}/history`);
+      setHistory(res.data);
+    } catch (e) {
+      console.error("Failed loading history:", e);
+    }
+  };
 
   const saveAnnotation = async (patch) => {
     setSaving(true);
@@ -79,8 +90,23 @@ export default function PropertyCard({ property, onAnnotationChange }) {
             <span className="font-medium">€/m²:</span> {latest.price_per_m2 ?? "-"} &nbsp;|&nbsp;
             <span className="font-medium">Area:</span> {property.area ?? "-"} m² &nbsp;|&nbsp;
             <span className="font-medium">Typology:</span> {property.typology ?? "-"}
+            &nbsp;|&nbsp;
+            <button className="text-blue-600 hover:underline" onClick={toggleHistory}>
+              {history ? "Hide history" : "History"}
+            </button>
           </div>
 
+          {history && (
+            <div className="text-xs text-gray-600 mt-1">
+              {history.dates.map((d, i) => (
+                <span key={d + i} className="mr-3">
+                  {new Date(d).toLocaleDateString()}: {history.price[i] ?? "-"}
+                  {history.status[i] ? ` (${history.status[i]})` : ""}
+                </span>
+              ))}
+            </div>
+          )}
+
           {/* Annotation controls */}
           <div className="mt-3 grid grid-cols-1 md:grid-cols-4 gap-2 items-center">
             <label className="inline-flex items-center gap-2">
@@ -0,0 +1,27 @@
+import api from "./api";
+
+// Server-sent events from the backend (GET /events):
+//   generation  { generation }   data changed (snapshot added or deleted)
+//   ingest      { ingest_id, filename, stage, rows, total, rate }
+// EventSource reconnects by itself; on reconnect the server sends the current
+// generation again, so a client that missed a change still notices it.
+export function subscribeEvents(handlers) {
+  if (typeof window === "undefined" || !window.EventSource) return () => {};
+  const source = new EventSource(`${api.defaults.baseURL}/events`);
+  Object.entries(handlers).forEach(([name, handler]) => {
+    source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+  });
+  return () => source.close();
+}
+
+// Calls onChange(generation) only when the generation differs from the first
+// one seen, i.e. when data loaded before the change is out of date.
+export function onGenerationChange(onChange) {
+  let current = null;
+  return subscribeEvents({
+    generation: ({ generation }) => {
+      if (current !== null && generation !== current) onChange(generation);
+      current = generation;
+    },
+  });
+}
@@ -3,7 +3,14 @@ import Graphs from "../components/Graphs";
 import PropertyCard from "../components/PropertyCard";
 import Filters from "../components/Filters";
 import api from "../lib/api";
-import { useEffect, useState, useMemo } from "react";
+import { onGenerationChange } from "../lib/events";
+import { useEffect, useState, useMemo, useRef } from "react";
+
+// Columns PropertyCard actually renders; keeps the listing payload small
+const CARD_FIELDS = [
+  "property_id", "title", "url", "area", "typology",
+  "price", "price_per_m2", "district", "city", "zone", "image_url",
+].join(",");
 
 export default function Home() {
   const [properties, setProperties] = useState([]);
@@ -23,7 +30,7 @@ export default function Home() {
   const loadData = async (activeFilters = {}) => {
     try {
       const query = buildQuery(activeFilters);
-      const res = await api.get(`/properties/?${query}`);
+      const res = await api.get(`/properties/?${query}&fields=${CARD_FIELDS}&include=latest,annotations`);
 
       // Filter out listings marked "Interesting: No"
       const filtered = (res.data || []).filter((p) => {
@@ -64,6 +71,14 @@ export default function Home() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [filters]);
 
+  // Re-fetch only when a snapshot was added or deleted
+  const filtersRef = useRef(filters);
+  filtersRef.current = filters;
+  useEffect(() => {
+    return onGenerationChange(() => loadData(filtersRef.current));
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   const handleAnnotationChange = (propertyId, updatedAnnotation) => {
     setProperties((prev) => {
       const next = prev.map((p) => {
@@ -1,11 +1,65 @@
 import { useEffect, useState } from "react";
 import Layout from "../components/Layout";
 import api from "../lib/api";
+import { onGenerationChange, subscribeEvents } from "../lib/events";
+
+// Chunked, resumable upload: an interrupted upload (or a page reload) picks up
+// from the last byte the server has instead of starting over.
+const uploadKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+async function uploadResumable(file, onProgress) {
+  let status = null;
+  const saved = localStorage.getItem(uploadKey(file));
+  if (saved) {
+    try {
+      status = (await api.get(`/snapshots/uploads/${saved}`)).data;
+    } catch (err) {
+      status = null; // expired or unknown: start a new one
+    }
+  }
+  if (!status) {
+    status = (await api.post("/snapshots/uploads", { filename: file.name, size: file.size })).data;
+    localStorage.setItem(uploadKey(file), status.upload_id);
+  }
+
+  let failures = 0;
+  while (status.received < file.size) {
+    const end = Math.min(status.received + status.chunk_size, file.size);
+    try {
+      status = (
+        await api.put(
+          `/snapshots/uploads/${status.upload_id}?offset=${status.received}`,
+          file.slice(status.received, end),
+          { headers: { "Content-Type": "application/octet-stream" } }
+        )
+      ).data;
+      failures = 0;
+      onProgress?.(status.received / file.size);
+    } catch (err) {
+      if (++failures > 5) throw err;
+      await new Promise((r) => setTimeout(r, 1000 * failures));
+      // ask the server where to resume from
+      status = (await api.get(`/snapshots/uploads/${status.upload_id}`)).data;
+    }
+  }
+
+  try {
+    const snapshot = (await api.post(`/snapshots/uploads/${status.upload_id}/complete`)).data;
+    localStorage.removeItem(uploadKey(file));
+    return snapshot;
+  } catch (err) {
+    // a duplicate will never complete; anything else can be retried from here
+    if (err.response?.status === 409) localStorage.removeItem(uploadKey(file));
+    throw err;
+  }
+}
 
 export default function Snapshots() {
   const [snapshots, setSnapshots] = useState([]);
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
+  // ingest_id -> latest "ingest" event, for every ingest running on the server
+  const [ingests, setIngests] = useState({});
 
   const loadSnapshots = async () => {
     try {
@@ -20,19 +74,19 @@ export default function Snapshots() {
     e.preventDefault();
     if (!file) return alert("Please select an Excel file first.");
 
-    const formData = new FormData();
-    formData.append("file", file);
-
     try {
       setUploading(true);
-      await api.post("/snapshots/upload", formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
+      await uploadResumable(file);
       setFile(null);
+      // don't wait for the generation event to show our own upload
       loadSnapshots();
     } catch (err) {
       console.error("Upload failed:", err);
-      alert("Upload failed. Check console for details.");
+      if (err.response?.status === 409) {
+        alert(err.response.data.detail);
+      } else {
+        alert("Upload failed. Check console for details.");
+      }
     } finally {
       setUploading(false);
     }
@@ -50,6 +104,22 @@ export default function Snapshots() {
 
   useEffect(() => {
     loadSnapshots();
+    // the list changes only on a new generation (ours or another user's)
+    const stopGeneration = onGenerationChange(loadSnapshots);
+    const stopIngest = subscribeEvents({
+      ingest: (e) => {
+        setIngests((prev) => ({ ...prev, [e.ingest_id]: e }));
+        if (e.stage === "done" || e.stage === "failed") {
+          setTimeout(() => {
+            setIngests(({ [e.ingest_id]: _, ...rest }) => rest);
+          }, 5000);
+        }
+      },
+    });
+    return () => {
+      stopGeneration();
+      stopIngest();
+    };
   }, []);
 
   return (
@@ -64,7 +134,7 @@ export default function Snapshots() {
         >
           <input
             type="file"
-            accept=".xlsx"
+            accept=".xlsx,.xls,.csv,.zip"
             onChange={(e) => setFile(e.target.files[0])}
             className="border p-2 rounded w-full"
           />
@@ -77,6 +147,17 @@ export default function Snapshots() {
           </button>
         </form>
 
+        {/* Ingest progress */}
+        {Object.values(ingests).map((e) => (
+          <div key={e.ingest_id} className="mb-4 bg-white p-3 rounded shadow text-sm text-gray-700">
+            <span className="font-semibold">{e.filename}</span>{" "}
+            {e.stage === "failed"
+              ? `failed: ${e.detail}`
+              : `${e.stage}: ${e.rows}${e.total ? ` / ${e.total}` : ""} rows` +
+                (e.rate ? ` (${Math.round(e.rate)} rows/s)` : "")}
+          </div>
+        ))}
+
         {/* Snapshot cards */}
         <div className="grid gap-4">
           {snapshots.map((s) => (
@@ -90,7 +171,7 @@ export default function Snapshots() {
                   {new Date(s.upload_date).toLocaleString()}
                 </p>
                 <p className="text-sm text-gray-600">
-                  {s.property_count} properties
+                  {s.properties_count} properties
                 </p>
               </div>
               <button